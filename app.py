@@ -13,22 +13,21 @@ VERSION = "0.2.2"
 #                                imports
 #---------------------------------------------------------------------------
 
-import os
-import json
-import numpy as np
-import matplotlib.cm as cm
-
-import plotly.graph_objs as go
-
-
 from pathlib import Path
-from functools import reduce
-from operator import itemgetter
-from plyfile import PlyData, PlyElement
 
 import streamlit as st
 
-from utils import *
+from utils import (plotly_Surface_Triangulation, comparison_figure, paper_bgcolr,
+                   triangle_budgets, edge_modes, payload_modes, quantize_levels, color_fields,
+                   selection_shapes, parse_point, clip_planes, upload_stage, export_stage,
+                   points_stage)
+from mesh_io import MESH_FORMATS, UPLOAD_LIMITS, EXPORT_FORMATS, MeshFormatError
+from point_cloud import POINT_FORMATS, TRIANGULATION_METHODS
+from mesh_cache import mesh_cache
+from catalog import app_catalog, catalog_names, catalog_label
+from instrument import tracing, TRACE_LOG
+from prefetch import Prefetcher, Refiner
+from thumbnails import build_thumbnails
 
 
 
@@ -54,12 +53,12 @@ st.set_page_config(
 
 Path(f"Output").mkdir(parents=True, exist_ok=True)
 
-car_models_list = next(os.walk("data/car_models_json"))[2]
-car_models_list = [i.replace(".json", "") for i in car_models_list]
+# the catalog index describes every model without parsing it on each rerun;
+# new or changed files are indexed in the background, see app_catalog
+catalog, catalog_ready = app_catalog()
 
-
-ply_file_list = next(os.walk("data/ply_data"))[2]
-ply_file_list = [i.replace(".ply", "") for i in ply_file_list]
+car_models_list = catalog_names(catalog, ".json")
+ply_file_list = catalog_names(catalog, ".ply")
 
 # insert None at index 0
 car_models_list.insert(0, None)
@@ -87,20 +86,143 @@ with h3:
 m1, m2, m3 = st.columns(3, gap="large")
 
 filename = None
+source = None
+trace = None
+with st.sidebar:
+    show_timings = st.checkbox("Show stage timings")
+    prefetch_models = st.checkbox("Prefetch neighbouring models", value=True,
+                                  help="Load the models next to the selected one in the background")
+    progressive = st.checkbox("Progressive rendering", value=True,
+                              help="Show a coarse level of detail first, then refine it")
+
+# one prefetcher per session; a new selection cancels its pending jobs
+prefetcher = st.session_state.setdefault('prefetcher', Prefetcher(radius=2, most_viewed=2))
+refiner = st.session_state.setdefault('refiner', Refiner())
+
 with m1: 
     
-    select_data = st.selectbox("Select Sample Data", [None, "JSON(Car Models)", "Ply Files"])
+    select_data = st.selectbox("Select Sample Data", [None, "JSON(Car Models)", "Ply Files", "Upload",
+                                                      "Point Cloud", "Gallery", "Compare Models"])
         
     if select_data == "Ply Files":
         with m2:
-            filename = st.selectbox("Select Sample Ply File", ply_file_list)
+            filename = st.selectbox("Select Sample Ply File", ply_file_list,
+                                    format_func=catalog_label(catalog, ".ply"))
             data_type = ".ply"
     
     elif select_data == "JSON(Car Models)":
         with m3:
-            filename = st.selectbox("Select Sample JSON File", car_models_list)
+            filename = st.selectbox("Select Sample JSON File", car_models_list,
+                                    format_func=catalog_label(catalog, ".json"))
             data_type = ".json"
 
+    elif select_data == "Gallery":
+        # set by the Open button of a thumbnail
+        opened = st.session_state.get('gallery_model')
+        if opened is not None:
+            filename, data_type = opened
+            with m2:
+                st.button("Back to Gallery", on_click=st.session_state.pop, args=('gallery_model', None))
+
+    elif select_data == "Point Cloud":
+        with m2:
+            uploaded = st.file_uploader("Upload x, y, z Points",
+                                        type=[suffix.lstrip('.') for suffix in POINT_FORMATS],
+                                        help="CSV or Excel with x, y, z columns (else the first three), "
+                                             "or a .npy array of shape (n, 3)")
+        with m3:
+            method = st.selectbox("Triangulation",
+                                  TRIANGULATION_METHODS,
+                                  format_func=lambda method: {'auto': "Auto (grid if gridded)",
+                                                              'grid': "Grid",
+                                                              'delaunay': "2.5D Delaunay"}[method])
+            if uploaded is not None:
+                try:
+                    source_key, source_mesh, points_info = points_stage(uploaded.name, uploaded, method)
+                except (ValueError, ImportError) as error:  # MeshFormatError is a ValueError
+                    st.error(f"Cannot triangulate {uploaded.name}: {error}")
+                else:
+                    source = (source_key, source_mesh)
+                    filename, data_type = uploaded.name, Path(uploaded.name).suffix.lower()
+                    st.caption(f"{points_info['points']:,} points, {points_info['triangles']:,} triangles "
+                               f"({points_info['method']}) in {points_info['seconds'] * 1000:.0f} ms")
+
+    elif select_data == "Upload":
+        with m2:
+            uploaded = st.file_uploader("Upload a Mesh",
+                                        type=[suffix.lstrip('.') for suffix in MESH_FORMATS],
+                                        help=f"PLY, OBJ or STL up to {UPLOAD_LIMITS['max_bytes'] // 2**20} MB")
+            if uploaded is not None:
+                try:
+                    source = upload_stage(uploaded.name, uploaded)
+                except MeshFormatError as error:  # includes MeshLimitError
+                    st.error(f"Cannot read {uploaded.name}: {error}")
+                else:
+                    filename, data_type = uploaded.name, Path(uploaded.name).suffix.lower()
+
+
+if select_data == "Gallery" and filename is None and not catalog_ready:
+
+    st.info("The model catalog is being built, the gallery opens once it is ready. "
+            "Build it at deploy time with `python catalog.py`.")
+
+elif select_data == "Gallery" and filename is None:
+
+    # thumbnails are rendered once per model content, then read from disk
+    progress = st.empty()
+    thumbnails = build_thumbnails(catalog, progress=lambda done, todo: progress.progress(
+        done / todo, text=f"Rendering thumbnails {done}/{todo}"))
+    progress.empty()
+
+    gallery_filter = st.text_input("Filter Models").strip().lower()
+    entries = sorted((entry for entry in catalog.values() if gallery_filter in entry['name'].lower()),
+                     key=lambda entry: (entry['format'], entry['name']))
+
+    gallery_cols = st.columns(6)
+    for i, entry in enumerate(entries):
+        with gallery_cols[i % len(gallery_cols)]:
+            st.image(str(thumbnails[entry['path']]),
+                     caption=catalog_label(catalog, entry['format'])(entry['name']))
+            st.button("Open", key=f"open {entry['path']}",
+                      on_click=st.session_state.__setitem__,
+                      args=('gallery_model', (entry['name'], entry['format'])))
+
+
+if select_data == "Compare Models":
+
+    compare_models = st.multiselect("Select Models to Compare",
+                                    [(name, ".json") for name in car_models_list[1:]] +
+                                    [(name, ".ply") for name in ply_file_list[1:]],
+                                    format_func=lambda model: catalog_label(catalog, model[1])(model[0]))
+
+    if compare_models:
+        c4, c5 = st.columns([0.2, 0.8], gap="small")
+
+        with c4:
+            paper_bgcolr_sel = st.selectbox("Select Paper Background",
+                                            paper_bgcolr,
+                                            index=paper_bgcolr.index('peachpuff'))
+            cols = st.slider("Models per Row", min_value=1, max_value=4, value=2)
+            height = st.slider("Select Row Height",
+                               min_value=300,
+                               max_value=900,
+                               value=450,
+                               step=50)
+            max_triangles = st.selectbox("Triangle Budget",
+                                         triangle_budgets,
+                                         format_func=lambda n: "Full mesh" if n is None else f"{n:,}")
+
+        with c5:
+            fig, timings = comparison_figure(compare_models,
+                                             cols=cols,
+                                             paper_bgcolor=paper_bgcolr_sel,
+                                             height=height,
+                                             max_triangles=max_triangles)
+            st.caption(f"Built {len(compare_models)} models in {timings['wall_time']:.2f}s "
+                       f"(slowest {max(timings['model_times']):.2f}s, "
+                       f"sum {sum(timings['model_times']):.2f}s)")
+            st.plotly_chart(fig, use_container_width=True)
+
 
 if filename:
     
@@ -120,14 +242,146 @@ if filename:
                         max_value=1200, 
                         value=600, 
                         step=50) 
+        clean = st.checkbox("Clean Mesh",
+                            help="Weld duplicate vertices, drop degenerate and duplicate faces")
+        max_triangles = st.selectbox("Triangle Budget",
+                                     triangle_budgets,
+                                     format_func=lambda n: "Full mesh" if n is None else f"{n:,}")
+        plot_edges = st.selectbox("Edges",
+                                  edge_modes,
+                                  format_func=lambda mode: "None" if mode is None else mode.title())
+        payload = st.selectbox("Payload",
+                               payload_modes,
+                               format_func=lambda mode: "Binary (float32, typed arrays)" if mode == 'binary' else "JSON")
+        quantize_bits = st.selectbox("Coordinate Quantization",
+                                     quantize_levels,
+                                     format_func=lambda bits: "None" if bits is None else f"{bits} bits")
+        color_by = st.selectbox("Color By",
+                                color_fields,
+                                format_func=lambda field: field.replace('_', ' ').title())
+
+        with st.expander("Select / Measure"):
+            selection = None
+            shape = st.selectbox("Selection",
+                                 selection_shapes,
+                                 format_func=lambda shape: "None" if shape is None else shape.title())
+            if shape is not None:
+                center = tuple(st.slider(f"Center {axis} (fraction of the bounding box)",
+                                         min_value=0.0, max_value=1.0, value=0.5, step=0.01)
+                               for axis in "xyz")
+                size = st.slider("Size (fraction of the diagonal)",
+                                 min_value=0.01, max_value=1.0, value=0.15, step=0.01)
+                selection = (shape, center, size)
+
+            # hovering the model shows the coordinates to type in here
+            measure_from = st.text_input("Measure from (x, y, z)")
+            measure_to = st.text_input("Measure to (x, y, z)")
+            measure = None
+            if measure_from and measure_to:
+                measure = (parse_point(measure_from), parse_point(measure_to))
+                if None in measure:
+                    st.warning("Type the points as three numbers, e.g. 0.5, 1, -2")
+                    measure = None
+
+        with st.expander("Clip"):
+            clip = None
+            plane = st.selectbox("Clipping Plane",
+                                 [None, *clip_planes, 'custom'],
+                                 format_func=lambda plane: "None" if plane is None else
+                                 plane.title() if plane == 'custom' else f"Normal to {plane}")
+            if plane is not None:
+                if plane == 'custom':
+                    normal = tuple(st.number_input(f"Normal {axis}", value=1.0 if axis == 'x' else 0.0,
+                                                   step=0.1)
+                                   for axis in "xyz")
+                else:
+                    normal = clip_planes[plane]
+                position = st.slider("Plane Position",
+                                     min_value=0.0, max_value=1.0, value=0.5, step=0.01)
+                if st.checkbox("Keep the other side"):
+                    normal = tuple(-c for c in normal)
+                if any(normal):
+                    clip = (normal, position)
+                else:
+                    st.warning("The plane normal must not be zero")
+
+        with st.expander("Export"):
+            export_format = st.selectbox("Export Format",
+                                         [None, *EXPORT_FORMATS],
+                                         format_func=lambda fmt: {None: "None",
+                                                                  'ply': "Binary PLY",
+                                                                  'stl': "Binary STL",
+                                                                  'glb': "GLB (glTF binary)"}[fmt])
+            if export_format is not None:
+                # the mesh at the chosen cleanup and triangle budget, built
+                # once per format and level
+                suffix, mime, _ = EXPORT_FORMATS[export_format]
+                export_data = export_stage(filename, data_type, export_format,
+                                           max_triangles=max_triangles, clean=clean, source=source)
+                st.download_button(f"Download ({len(export_data) / 2**20:.1f} MB)",
+                                   export_data,
+                                   file_name=Path(filename).stem + suffix,
+                                   mime=mime)
         
     with m5: 
-        with st.container():
+        with st.container(), tracing(enabled=show_timings or bool(TRACE_LOG),
+                                     model=filename, data_type=data_type) as trace:
             plotly_Surface_Triangulation(filename, #car_models_list[1],
                                         data_type=data_type,
                                         axis=True,
                                         paper_bgcolor=paper_bgcolr_sel,
                                         width=width,
                                         height=height,
-                                        save_html=None
-                                        )
\ No newline at end of file
+                                        save_html=None,
+                                        max_triangles=max_triangles,
+                                        plot_edges=plot_edges,
+                                        payload=payload,
+                                        quantize_bits=quantize_bits,
+                                        clean=clean,
+                                        color_by=color_by,
+                                        selection=selection,
+                                        measure=measure,
+                                        clip=clip,
+                                        source=source,
+                                        progressive=refiner if progressive else None
+                                        )
+
+    # an upload has no neighbouring models to prefetch
+    if prefetch_models and source is None:
+        # runs on the background pool after the chart is sent
+        prefetcher.after_view((filename, data_type),
+                              [(name, data_type) for name in
+                               (ply_file_list if data_type == ".ply" else car_models_list)],
+                              max_triangles=max_triangles,
+                              clean=clean,
+                              color_by=color_by)
+    else:
+        prefetcher.cancel()
+
+else:
+    prefetcher.cancel()
+    refiner.cancel()
+
+
+# -------------------------------------------------------------------------------------------
+#                                mesh cache status
+# -------------------------------------------------------------------------------------------
+# rendered last so the counters include this rerun
+with st.sidebar:
+    cache_stats = mesh_cache.stats()
+    st.markdown("#### Mesh Cache")
+    st.progress(min(cache_stats['nbytes'] / cache_stats['max_bytes'], 1.0),
+                text=f"{cache_stats['nbytes'] / 2**20:.1f} / {cache_stats['max_bytes'] / 2**20:.0f} MB"
+                     f" in {cache_stats['entries']} entries")
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Hits", cache_stats['hits'])
+    c2.metric("Misses", cache_stats['misses'])
+    c3.metric("Evictions", cache_stats['evictions'])
+
+    if show_timings and trace is not None:
+        st.markdown("#### Stage Timings")
+        st.dataframe([dict(stage="  " * s['depth'] + s['name'],
+                           ms=round(s.get('seconds', 0) * 1000, 1),
+                           **{k: v for k, v in s.items() if k not in ('name', 'depth', 'seconds')})
+                      for s in trace.spans])
+        st.caption(", ".join(f"{k}: {v}" for k, v in trace.counters.items()))
@@ -0,0 +1,296 @@
+__author__ = "Hari Krishna Veerala"
+__credits__ = ["", ""]
+__license__ = ""
+__version__ = "1.0.1"
+__maintainer__ = ""
+__email__ = "veeralakrishna.com"
+__status__ = "Development" # Production/Development
+
+
+#---------------------------------------------------------------------------
+#                                imports
+#---------------------------------------------------------------------------
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import platform
+import tracemalloc
+import numpy as np
+
+import plotly
+import plotly.io as pio
+import plotly.graph_objs as go
+
+from pathlib import Path
+
+from colormaps import RdBu
+from mesh_ops import sample_faces
+from mesh_index import PointTree
+from point_cloud import grid_triangulate, delaunay_triangulate
+from mesh_io import read_ply
+from utils import convert_json_model, load_json_model, face_colors, plotly_trisurf, PROGRESSIVE_LEVELS
+from catalog import DATA_DIRS
+
+
+#---------------------------------------------------------------------------
+#                                Benchmark suite
+#---------------------------------------------------------------------------
+
+# stages timed for every case, in pipeline order
+STAGES = ["convert", "parse", "extract", "color", "figure", "serialize", "first_pixel", "index", "nearest", "brute",
+          "grid", "delaunay"]
+
+SYNTHETIC_SIZES = [10_000, 100_000, 1_000_000, 5_000_000]
+
+# point table sizes of the triangulation cases
+POINT_SIZES = [100_000, 1_000_000, 4_000_000]
+
+# nearest vertex queries per case; the brute force scan runs a sample of
+# them and is scaled up to the same count
+QUERIES = 1000
+BRUTE_QUERIES = 20
+
+
+def synthetic_mesh(n_triangles):
+    """
+    return:
+        returns x, y, z, triangles of a wavy square grid surface with about
+        n_triangles triangles
+    """
+    side = max(int(np.ceil(np.sqrt(n_triangles / 2))), 1)
+    u, v = np.meshgrid(np.linspace(0, 1, side + 1), np.linspace(0, 1, side + 1))
+    x, y = u.ravel(), v.ravel()
+    z = 0.1 * np.sin(8 * np.pi * x) * np.cos(8 * np.pi * y)
+
+    corner = (np.arange(side)[:, None] * (side + 1) + np.arange(side)).ravel()
+    quads = np.stack((corner, corner + 1, corner + side + 2, corner + side + 1), axis=1)
+    triangles = np.concatenate((quads[:, [0, 1, 2]], quads[:, [0, 2, 3]]))
+
+    return x, y, z, triangles
+
+
+class StageTimer:
+    """
+    run the stages of one case: the best wall time over repeat runs, then
+    (optionally) one more run under tracemalloc for the peak memory, so
+    the tracing overhead never shows up in the timings
+    """
+
+    def __init__(self, repeat=1, memory=True):
+        self.repeat = repeat
+        self.memory = memory
+        self.record = {}
+
+    def run(self, stage, function):
+        seconds = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            result = function()
+            seconds.append(time.perf_counter() - start)
+
+        peak_bytes = None
+        if self.memory:
+            tracemalloc.start()
+            function()
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        self.record[stage] = dict(seconds=min(seconds), peak_bytes=peak_bytes)
+
+        return result
+
+
+def bench_mesh(timer, x, y, z, triangles, color_mode):
+    """
+    time the color, figure and serialize stages of a loaded mesh
+    """
+    colors = timer.run("color", lambda: face_colors(x, y, z, triangles, RdBu, color_mode))
+    fig = timer.run("figure", lambda: go.Figure(data=plotly_trisurf(x, y, z, triangles, colors=colors)))
+    payload = timer.run("serialize", lambda: pio.to_json(fig, validate=False))
+
+    # the first view of progressive rendering, a face sample colored,
+    # built and serialized the same way (see utils.progressive_stage)
+    def first_pixel():
+        vertices, sample = sample_faces(np.column_stack((x, y, z)), triangles, PROGRESSIVE_LEVELS[0])
+        sx, sy, sz = vertices.T
+        sample_colors = face_colors(sx, sy, sz, sample, RdBu, color_mode)
+        return pio.to_json(go.Figure(data=plotly_trisurf(sx, sy, sz, sample, colors=sample_colors)),
+                           validate=False)
+
+    timer.run("first_pixel", first_pixel)
+
+    # spatial index: build, then nearest vertex of QUERIES points against
+    # the brute force scan it replaces
+    vertices = np.column_stack((x, y, z))
+    queries = np.random.default_rng(0).uniform(vertices.min(axis=0), vertices.max(axis=0), (QUERIES, 3))
+    tree = timer.run("index", lambda: PointTree(vertices))
+    timer.run("nearest", lambda: tree.nearest(queries))
+    timer.run("brute", lambda: [((vertices - query) ** 2).sum(axis=1).argmin() for query in queries[:BRUTE_QUERIES]])
+    timer.record["brute"]["seconds"] *= QUERIES / BRUTE_QUERIES
+
+    timer.record["triangles"] = len(triangles)
+    timer.record["payload_bytes"] = len(payload)
+
+    return timer.record
+
+
+def bench_points(timer, n_points):
+    """
+    time the triangulation of about n_points float32 points: the grid
+    triangulation of a gridded table and the 2.5D delaunay of a scattered
+    one (the delaunay is skipped without scipy)
+    """
+    x, y, z, _ = synthetic_mesh(2 * n_points)
+    grid = np.column_stack((x, y, z)).astype(np.float32)
+    triangles = timer.run("grid", lambda: grid_triangulate(grid))
+
+    xy = np.random.default_rng(0).uniform(0, 1, (len(grid), 2))
+    scattered = np.column_stack((xy, 0.1 * np.sin(8 * np.pi * xy[:, 0]))).astype(np.float32)
+    try:
+        timer.run("delaunay", lambda: delaunay_triangulate(scattered))
+    except ImportError:
+        pass
+
+    timer.record["points"] = len(grid)
+    timer.record["triangles"] = len(triangles)
+
+    return timer.record
+
+
+def bench_file(file_path, data_type, color_mode="facecolor", repeat=1, memory=True):
+    """
+    time every stage of one model file, parse included; json models are
+    converted to a temporary binary cache, see utils.load_json_model
+    """
+    timer = StageTimer(repeat, memory)
+
+    if data_type == ".ply":
+        # the two steps of utils.load_ply: read_ply memory-maps the file
+        # when it is already in the binary triangle layout and uses the
+        # fast readers otherwise, then the coordinates are split into x, y, z
+        def parse():
+            with open(file_path, "rb") as f:
+                return read_ply(f, limits=None)
+
+        vertices, triangles = timer.run("parse", parse)
+        x, y, z = timer.run("extract", lambda: [np.ascontiguousarray(vertices[:, axis]) for axis in range(3)])
+
+    else:
+        # the path of the app through the binary cache: a cold conversion
+        # of the json, then the warm memory-mapped load of every later view
+        with tempfile.TemporaryDirectory() as cache_dir:
+            timer.run("convert", lambda: convert_json_model(file_path, cache_dir))
+            vertices, triangles, _ = timer.run("parse", lambda: load_json_model(file_path, cache_dir))
+            # the axes of utils.load_mesh, read from the mapped vertices
+            x, y, z = timer.run("extract", lambda: (vertices[:, 0], vertices[:, 2], -vertices[:, 1]))
+            record = bench_mesh(timer, x, y, z, triangles, color_mode)
+            del vertices, triangles, x, y, z  # close the memory maps before the cleanup
+
+        return record
+
+    return bench_mesh(timer, x, y, z, triangles, color_mode)
+
+
+def run_benchmarks(sizes=SYNTHETIC_SIZES, color_mode="facecolor", repeat=1, memory=True, files=True,
+                   point_sizes=POINT_SIZES):
+    """
+    return:
+        returns the benchmark report: environment metadata and the stage
+        records of every data file and synthetic mesh
+    """
+    cases = {}
+    if files:
+        for data_type, data_dir in DATA_DIRS.items():
+            for file_name in sorted(os.listdir(data_dir)):
+                if file_name.endswith(data_type):
+                    file_path = os.path.join(data_dir, file_name)
+                    cases[Path(file_path).as_posix()] = bench_file(file_path, data_type, color_mode, repeat, memory)
+                    print_case(Path(file_path).as_posix(), cases[Path(file_path).as_posix()])
+
+    for n_triangles in sizes:
+        name = f"synthetic/{n_triangles}"
+        x, y, z, triangles = synthetic_mesh(n_triangles)
+        cases[name] = bench_mesh(StageTimer(repeat, memory), x, y, z, triangles, color_mode)
+        print_case(name, cases[name])
+
+    for n_points in point_sizes:
+        name = f"points/{n_points}"
+        cases[name] = bench_points(StageTimer(repeat, memory), n_points)
+        print_case(name, cases[name])
+
+    return dict(meta=dict(time=time.strftime("%Y-%m-%dT%H:%M:%S"),
+                          python=platform.python_version(),
+                          numpy=np.__version__,
+                          plotly=plotly.__version__,
+                          color_mode=color_mode,
+                          repeat=repeat),
+                cases=cases)
+
+
+def print_case(name, record):
+    stages = "  ".join(f"{stage} {record[stage]['seconds'] * 1000:8.1f} ms"
+                       for stage in STAGES if stage in record)
+    print(f"{name:50s} {record['triangles']:>9,} tri  {stages}")
+
+
+def compare(report, baseline, threshold=0.2, min_seconds=0.002):
+    """
+    flag the stages that got slower than the baseline by more than
+    threshold (relative) and min_seconds (absolute, to ignore timer noise)
+
+    return:
+        returns the list of regressions as (case, stage, baseline, current)
+    """
+    regressions = []
+    for name, record in report["cases"].items():
+        base_record = baseline["cases"].get(name)
+        if base_record is None:
+            continue
+        for stage in STAGES:
+            if stage not in record or stage not in base_record:
+                continue
+            current, base = record[stage]["seconds"], base_record[stage]["seconds"]
+            if current > base * (1 + threshold) and current - base > min_seconds:
+                regressions.append((name, stage, base, current))
+
+    return regressions
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark load, color, figure and serialize stages over data/")
+    parser.add_argument("--out", default="bench_results.json", help="machine-readable results file")
+    parser.add_argument("--compare", metavar="BASELINE", help="flag regressions against a stored results file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative slowdown flagged as regression")
+    parser.add_argument("--sizes", default=",".join(map(str, SYNTHETIC_SIZES)),
+                        help="synthetic mesh triangle counts, comma separated ('' for none)")
+    parser.add_argument("--point-sizes", default=",".join(map(str, POINT_SIZES)),
+                        help="point table sizes of the triangulation cases, comma separated ('' for none)")
+    parser.add_argument("--color-mode", default="facecolor", choices=["facecolor", "intensity"])
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage, the fastest is kept")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak memory runs")
+    parser.add_argument("--no-files", action="store_true", help="only run the synthetic meshes")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    point_sizes = [int(size) for size in args.point_sizes.split(",") if size]
+    report = run_benchmarks(sizes, args.color_mode, args.repeat, not args.no_memory, not args.no_files,
+                            point_sizes)
+
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for name, stage, base, current in regressions:
+            print(f"REGRESSION {name} {stage}: {base * 1000:.1f} ms -> {current * 1000:.1f} ms "
+                  f"({current / base - 1:+.0%})")
+        print(f"{len(regressions)} regressions against {args.compare}")
+        sys.exit(1 if regressions else 0)
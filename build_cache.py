@@ -0,0 +1,93 @@
+__author__ = "Hari Krishna Veerala"
+__credits__ = ["", ""]
+__license__ = ""
+__version__ = "1.0.1"
+__maintainer__ = ""
+__email__ = "veeralakrishna.com"
+__status__ = "Development" # Production/Development
+
+
+#---------------------------------------------------------------------------
+#                                imports
+#---------------------------------------------------------------------------
+
+import os
+import time
+import argparse
+
+from utils import CACHE_DIR, convert_json_model, _read_json_cache_meta
+from mesh_io import convert_ply, is_binary_triangle_ply
+
+
+#---------------------------------------------------------------------------
+#                                Build binary mesh cache
+#---------------------------------------------------------------------------
+
+def build_json_cache(json_dir="data/car_models_json", cache_dir=CACHE_DIR, force=False):
+    """
+    convert every car-model json file in json_dir to the binary cache,
+    skipping the ones whose cache entry is still up to date
+    """
+    converted = 0
+    start = time.perf_counter()
+    for name in sorted(os.listdir(json_dir)):
+        if not name.endswith(".json"):
+            continue
+
+        file_path = os.path.join(json_dir, name)
+        if not force and _read_json_cache_meta(file_path, cache_dir) is not None:
+            continue
+
+        t = time.perf_counter()
+        meta = convert_json_model(file_path, cache_dir)
+        converted += 1
+        print(f"{name}: {meta['nr_vertices']} vertices, {meta['nr_faces']} faces "
+              f"in {time.perf_counter() - t:.2f}s")
+
+    print(f"converted {converted} models in {time.perf_counter() - start:.2f}s")
+
+
+def convert_ply_files(ply_dir="data/ply_data", out_dir=None, force=False):
+    """
+    rewrite every .ply file in ply_dir as binary_little_endian with fixed
+    width triangle faces, the layout load_ply memory-maps; in place unless
+    out_dir is given, skipping the files already in that layout
+    """
+    converted = 0
+    start = time.perf_counter()
+    if out_dir is not None:
+        os.makedirs(out_dir, exist_ok=True)
+    for name in sorted(os.listdir(ply_dir)):
+        if not name.endswith(".ply"):
+            continue
+
+        file_path = os.path.join(ply_dir, name)
+        if not force and out_dir is None and is_binary_triangle_ply(file_path):
+            continue
+
+        t = time.perf_counter()
+        info = convert_ply(file_path, os.path.join(out_dir, name) if out_dir else None)
+        converted += 1
+        print(f"{name}: {info['vertices']} vertices, {info['triangles']} triangles, "
+              f"{info['src_bytes'] / 2**10:.0f} -> {info['dst_bytes'] / 2**10:.0f} KB "
+              f"in {time.perf_counter() - t:.2f}s")
+
+    print(f"converted {converted} ply files in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Convert the car-model json files to the binary mesh cache")
+    parser.add_argument("--json-dir", default="data/car_models_json")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--force", action="store_true", help="rebuild up-to-date entries too")
+    parser.add_argument("--ply", action="store_true",
+                        help="convert the .ply files to binary with triangle faces instead")
+    parser.add_argument("--ply-dir", default="data/ply_data")
+    parser.add_argument("--ply-out", help="write the converted .ply files here instead of in place")
+    args = parser.parse_args()
+
+    if args.ply:
+        convert_ply_files(args.ply_dir, args.ply_out, args.force)
+    else:
+        build_json_cache(args.json_dir, args.cache_dir, args.force)
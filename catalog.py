@@ -0,0 +1,247 @@
+__author__ = "Hari Krishna Veerala"
+__credits__ = ["", ""]
+__license__ = ""
+__version__ = "1.0.1"
+__maintainer__ = ""
+__email__ = "veeralakrishna.com"
+__status__ = "Development" # Production/Development
+
+
+#---------------------------------------------------------------------------
+#                                imports
+#---------------------------------------------------------------------------
+
+import os
+import json
+import time
+import hashlib
+import argparse
+import threading
+import numpy as np
+
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import CACHE_DIR, load_json_model, load_ply
+
+
+#---------------------------------------------------------------------------
+#                                Dataset-Catalog
+#---------------------------------------------------------------------------
+
+# directories scanned by the catalog and the data type of their files
+DATA_DIRS = {".json": "data/car_models_json",
+             ".ply": "data/ply_data"}
+
+CATALOG_PATH = os.path.join(CACHE_DIR, "catalog.json")
+
+
+def file_hash(file_path, chunk_size=2**20):
+    """
+    return:
+        returns the sha256 hex digest of the file content
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def catalog_entry(file_path, data_type, stat=None, sha256=None):
+    """
+    parse one model and describe it
+
+    return:
+        returns a dict with format, vertex and face counts, bounding box,
+        car_type (json only), file size, mtime and content hash
+    """
+    stat = stat or os.stat(file_path)
+
+    car_type = None
+    if data_type == ".json":
+        vertices, triangles, car_type = load_json_model(file_path)
+    else:
+        x, y, z, triangles = load_ply(file_path)
+        vertices = np.column_stack((x, y, z))
+
+    return dict(name=Path(file_path).stem,
+                format=data_type,
+                path=str(file_path),
+                vertices=len(vertices),
+                faces=len(triangles),
+                bbox=[vertices.min(axis=0).tolist(), vertices.max(axis=0).tolist()],
+                car_type=car_type,
+                size=stat.st_size,
+                mtime_ns=stat.st_mtime_ns,
+                sha256=sha256 or file_hash(file_path))
+
+
+def load_catalog(catalog_path=CATALOG_PATH):
+    """
+    return:
+        returns the catalog written by refresh_catalog, or an empty one
+    """
+    try:
+        with open(catalog_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def scan_data(data_dirs=DATA_DIRS):
+    """
+    yield (file_path, data_type, stat) of every model file, sorted by name
+    within each directory
+    """
+    for data_type, data_dir in data_dirs.items():
+        for dir_entry in sorted(os.scandir(data_dir), key=lambda e: e.name):
+            if dir_entry.is_file() and dir_entry.name.endswith(data_type):
+                yield Path(data_dir, dir_entry.name).as_posix(), data_type, dir_entry.stat()
+
+
+def is_current(entry, stat):
+    """
+    return:
+        returns True when the catalog entry was built from the file as it
+        is now (same size and mtime)
+    """
+    return entry is not None and (entry['size'], entry['mtime_ns']) == (stat.st_size, stat.st_mtime_ns)
+
+
+def refresh_catalog(catalog_path=CATALOG_PATH, data_dirs=DATA_DIRS, verbose=False):
+    """
+    bring the catalog up to date and write it back when anything changed.
+    Unchanged files (same size and mtime) cost one stat; touched files whose
+    content hash did not change are not parsed again
+
+    return:
+        returns the catalog, a dict from file path to catalog entry
+    """
+    catalog = load_catalog(catalog_path)
+    updated = {}
+    changed = False
+
+    for file_path, data_type, stat in scan_data(data_dirs):
+        entry = catalog.get(file_path)
+
+        if is_current(entry, stat):
+            updated[file_path] = entry
+            continue
+
+        changed = True
+        sha256 = file_hash(file_path)
+        if entry is not None and entry['sha256'] == sha256:
+            entry = dict(entry, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        else:
+            start = time.perf_counter()
+            entry = catalog_entry(file_path, data_type, stat, sha256)
+            if verbose:
+                print(f"{file_path}: {entry['vertices']} vertices, {entry['faces']} faces "
+                      f"in {time.perf_counter() - start:.2f}s")
+        updated[file_path] = entry
+
+    if changed or updated.keys() != catalog.keys():
+        Path(catalog_path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{catalog_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(updated, f, indent=1)
+        os.replace(tmp_path, catalog_path)
+
+    return updated
+
+
+# refreshes started by the app run here, one at a time, see app_catalog
+_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="catalog")
+_refresh = None
+_refresh_lock = threading.Lock()
+
+
+def listed_entry(file_path, data_type, stat):
+    """
+    return:
+        returns the entry of a file not indexed yet: its name, format and
+        path from the directory listing, the counts and hash are None
+    """
+    return dict(name=Path(file_path).stem,
+                format=data_type,
+                path=file_path,
+                vertices=None,
+                faces=None,
+                bbox=None,
+                car_type=None,
+                size=stat.st_size,
+                mtime_ns=stat.st_mtime_ns,
+                sha256=None)
+
+
+def app_catalog(catalog_path=CATALOG_PATH, data_dirs=DATA_DIRS):
+    """
+    read the catalog without parsing any model, so the app starts at once
+    on a fresh deploy. When files are new or changed, refresh_catalog runs
+    in a background thread and the files it has not indexed yet are listed
+    from the directories (see listed_entry) until a later rerun picks the
+    rebuilt catalog up. Build it at deploy time with `python catalog.py`
+    to skip this
+
+    return:
+        returns the catalog and whether it is complete
+    """
+    global _refresh
+
+    catalog = load_catalog(catalog_path)
+    listing = {}
+    for file_path, data_type, stat in scan_data(data_dirs):
+        entry = catalog.get(file_path)
+        listing[file_path] = entry if is_current(entry, stat) else listed_entry(file_path, data_type, stat)
+
+    if listing.keys() == catalog.keys() and all(entry['sha256'] for entry in listing.values()):
+        return listing, True
+
+    with _refresh_lock:
+        if _refresh is not None and _refresh.done():
+            _refresh.result()  # raise the error of a failed refresh
+        if _refresh is None or _refresh.done():
+            _refresh = _pool.submit(refresh_catalog, catalog_path, data_dirs)
+
+    return listing, False
+
+
+def catalog_names(catalog, data_type):
+    """
+    return:
+        returns the sorted model names of one data type
+    """
+    return sorted(entry['name'] for entry in catalog.values() if entry['format'] == data_type)
+
+
+def catalog_label(catalog, data_type):
+    """
+    return:
+        returns a selectbox format_func annotating model names with their
+        car type and triangle count
+    """
+    entries = {entry['name']: entry for entry in catalog.values() if entry['format'] == data_type}
+
+    def label(name):
+        if name is None:
+            return "None"
+        entry = entries[name]
+        if entry['faces'] is None:
+            return f"{name} (indexing)"
+        car_type = f" - {entry['car_type']}" if entry['car_type'] else ""
+        return f"{name}{car_type} ({entry['faces']:,} triangles)"
+
+    return label
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Build or refresh the dataset catalog index")
+    parser.add_argument("--catalog", default=CATALOG_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    catalog = refresh_catalog(args.catalog, verbose=True)
+    print(f"{len(catalog)} models indexed in {time.perf_counter() - start:.2f}s")
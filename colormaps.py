@@ -0,0 +1,129 @@
+__author__ = "Hari Krishna Veerala"
+__credits__ = ["", ""]
+__license__ = ""
+__version__ = "1.0.1"
+__maintainer__ = ""
+__email__ = "veeralakrishna.com"
+__status__ = "Development" # Production/Development
+
+
+#---------------------------------------------------------------------------
+#                                imports
+#---------------------------------------------------------------------------
+
+import numpy as np
+
+
+#---------------------------------------------------------------------------
+#                                Baked colormaps
+#---------------------------------------------------------------------------
+
+class BakedColormap:
+    """
+    A colormap stored as a table of rgb bytes, called like a matplotlib
+    colormap: floats in [0, 1] are binned into the table the same way, ints
+    index it directly, and the result is rgba floats. It lets the viewer
+    color meshes without importing matplotlib.
+    """
+
+    def __init__(self, name, table):
+        self.name = name
+        self.table = np.asarray(table, dtype=np.uint8)
+        self.N = len(self.table)
+        self._rgba = np.ones((self.N, 4))
+        self._rgba[:, :3] = self.table / 255
+
+    def __call__(self, X):
+        xa = np.array(X)
+        if xa.dtype.kind == "f":
+            # same binning as matplotlib Colormap.__call__
+            xa = np.clip(xa * self.N, 0, self.N - 1)
+        index = np.clip(xa.astype(np.intp), 0, self.N - 1)
+        rgba = self._rgba[index]
+
+        return tuple(rgba) if rgba.ndim == 1 else rgba
+
+
+# matplotlib RdBu, rounded to bytes like map_z2color does
+RdBu = BakedColormap("RdBu", [
+    (103,   0,  31), (106,   1,  31), (109,   2,  32), (112,   3,  32),
+    (115,   4,  33), (118,   5,  33), (121,   6,  34), (124,   7,  34),
+    (127,   8,  35), (129,   8,  35), (132,   9,  36), (135,  10,  36),
+    (138,  11,  37), (141,  12,  37), (144,  13,  38), (147,  14,  38),
+    (150,  15,  39), (153,  16,  39), (156,  17,  39), (159,  18,  40),
+    (162,  19,  40), (165,  20,  41), (168,  21,  41), (171,  22,  42),
+    (174,  23,  42), (177,  24,  43), (179,  25,  44), (180,  28,  45),
+    (182,  31,  46), (183,  34,  48), (184,  37,  49), (186,  40,  50),
+    (187,  42,  52), (189,  45,  53), (190,  48,  54), (191,  51,  56),
+    (193,  54,  57), (194,  56,  58), (196,  59,  60), (197,  62,  61),
+    (198,  65,  62), (200,  68,  64), (201,  71,  65), (203,  73,  66),
+    (204,  76,  68), (206,  79,  69), (207,  82,  70), (208,  85,  72),
+    (210,  88,  73), (211,  90,  74), (213,  93,  76), (214,  96,  77),
+    (215,  99,  79), (216, 101,  81), (218, 104,  83), (219, 107,  85),
+    (220, 110,  87), (221, 112,  89), (222, 115,  92), (223, 118,  94),
+    (225, 120,  96), (226, 123,  98), (227, 126, 100), (228, 128, 102),
+    (229, 131, 104), (230, 134, 106), (232, 137, 108), (233, 139, 110),
+    (234, 142, 112), (235, 145, 114), (236, 147, 116), (238, 150, 119),
+    (239, 153, 121), (240, 156, 123), (241, 158, 125), (242, 161, 127),
+    (243, 164, 129), (244, 166, 131), (245, 168, 134), (245, 170, 137),
+    (245, 172, 139), (246, 175, 142), (246, 177, 145), (246, 179, 148),
+    (247, 181, 150), (247, 183, 153), (247, 185, 156), (248, 187, 158),
+    (248, 189, 161), (248, 191, 164), (249, 194, 167), (249, 196, 169),
+    (249, 198, 172), (250, 200, 175), (250, 202, 177), (251, 204, 180),
+    (251, 206, 183), (251, 208, 185), (252, 211, 188), (252, 213, 191),
+    (252, 215, 194), (253, 217, 196), (253, 219, 199), (253, 220, 201),
+    (253, 221, 203), (252, 222, 205), (252, 223, 207), (252, 224, 208),
+    (252, 226, 210), (251, 227, 212), (251, 228, 214), (251, 229, 216),
+    (251, 230, 218), (250, 231, 220), (250, 232, 222), (250, 233, 223),
+    (250, 234, 225), (249, 235, 227), (249, 237, 229), (249, 238, 231),
+    (249, 239, 233), (249, 240, 235), (248, 241, 237), (248, 242, 239),
+    (248, 243, 240), (248, 244, 242), (247, 245, 244), (247, 246, 246),
+    (246, 247, 247), (245, 246, 247), (243, 245, 246), (242, 245, 246),
+    (240, 244, 246), (239, 243, 245), (237, 242, 245), (236, 242, 245),
+    (234, 241, 245), (233, 240, 244), (231, 240, 244), (230, 239, 244),
+    (228, 238, 244), (227, 237, 243), (225, 237, 243), (224, 236, 243),
+    (222, 235, 242), (221, 235, 242), (219, 234, 242), (218, 233, 242),
+    (216, 233, 241), (215, 232, 241), (213, 231, 241), (212, 230, 241),
+    (210, 230, 240), (209, 229, 240), (207, 228, 239), (204, 226, 239),
+    (202, 225, 238), (199, 224, 237), (197, 223, 236), (194, 221, 236),
+    (192, 220, 235), (189, 219, 234), (187, 218, 234), (184, 216, 233),
+    (182, 215, 232), (179, 214, 232), (177, 213, 231), (174, 211, 230),
+    (172, 210, 229), (169, 209, 229), (167, 208, 228), (165, 206, 227),
+    (162, 205, 227), (160, 204, 226), (157, 203, 225), (155, 201, 224),
+    (152, 200, 224), (150, 199, 223), (147, 198, 222), (144, 196, 221),
+    (141, 194, 220), (138, 192, 219), (135, 190, 218), (132, 188, 217),
+    (129, 186, 216), (126, 184, 215), (123, 182, 214), (120, 180, 213),
+    (117, 178, 212), (113, 176, 211), (110, 174, 210), (107, 172, 209),
+    (104, 171, 208), (101, 169, 207), ( 98, 167, 206), ( 95, 165, 205),
+    ( 92, 163, 203), ( 89, 161, 202), ( 86, 159, 201), ( 82, 157, 200),
+    ( 79, 155, 199), ( 76, 153, 198), ( 73, 151, 197), ( 70, 149, 196),
+    ( 67, 147, 195), ( 66, 145, 194), ( 64, 143, 193), ( 63, 142, 192),
+    ( 62, 140, 191), ( 60, 138, 190), ( 59, 136, 190), ( 58, 135, 189),
+    ( 56, 133, 188), ( 55, 131, 187), ( 54, 129, 186), ( 52, 128, 185),
+    ( 51, 126, 184), ( 50, 124, 183), ( 48, 122, 182), ( 47, 121, 181),
+    ( 46, 119, 181), ( 44, 117, 180), ( 43, 115, 179), ( 42, 113, 178),
+    ( 40, 112, 177), ( 39, 110, 176), ( 38, 108, 175), ( 36, 106, 174),
+    ( 35, 105, 173), ( 34, 103, 172), ( 32, 101, 171), ( 31,  99, 168),
+    ( 30,  97, 165), ( 29,  95, 162), ( 28,  92, 159), ( 27,  90, 156),
+    ( 26,  88, 153), ( 25,  86, 150), ( 24,  84, 147), ( 23,  82, 144),
+    ( 21,  80, 141), ( 20,  78, 138), ( 19,  76, 135), ( 18,  73, 132),
+    ( 17,  71, 129), ( 16,  69, 126), ( 15,  67, 123), ( 14,  65, 121),
+    ( 13,  63, 118), ( 12,  61, 115), ( 10,  59, 112), (  9,  56, 109),
+    (  8,  54, 106), (  7,  52, 103), (  6,  50, 100), (  5,  48,  97),
+])
+
+BAKED_COLORMAPS = {RdBu.name: RdBu}
+
+
+def get_colormap(name):
+    """
+    return:
+        returns the baked colormap of that name, or the matplotlib one;
+        matplotlib is only imported for colormaps that are not baked
+    """
+    if name in BAKED_COLORMAPS:
+        return BAKED_COLORMAPS[name]
+
+    import matplotlib
+
+    return matplotlib.colormaps[name]
@@ -0,0 +1,152 @@
+__author__ = "Hari Krishna Veerala"
+__credits__ = ["", ""]
+__license__ = ""
+__version__ = "1.0.1"
+__maintainer__ = ""
+__email__ = "veeralakrishna.com"
+__status__ = "Development" # Production/Development
+
+
+#---------------------------------------------------------------------------
+#                                imports
+#---------------------------------------------------------------------------
+
+import os
+import json
+import time
+import threading
+
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # not available on windows
+    resource = None
+
+
+#---------------------------------------------------------------------------
+#                                Instrumentation
+#---------------------------------------------------------------------------
+
+# append every trace to this jsonl file when set
+TRACE_LOG = os.environ.get("SURFACE_TRACE_LOG")
+
+_local = threading.local()
+_log_lock = threading.Lock()
+
+
+class _NoSpan:
+    """
+    the span handed out when tracing is off: a shared, do-nothing context
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Span:
+    """
+    one timed stage; attributes (array sizes, payload bytes, ...) can be
+    attached while it runs
+    """
+
+    def __init__(self, trace, name, attrs):
+        self.trace = trace
+        self.record = dict(name=name, depth=trace.depth, **attrs)
+
+    def __enter__(self):
+        self.trace.depth += 1
+        self.trace.spans.append(self.record)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.record['seconds'] = time.perf_counter() - self.start
+        if resource is not None:
+            # peak resident memory of the process so far, in MB
+            self.record['max_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        self.trace.depth -= 1
+        return False
+
+    def set(self, **attrs):
+        self.record.update(attrs)
+
+
+class Trace:
+    """
+    the spans and counters recorded during one traced block, e.g. one
+    Streamlit rerun
+    """
+
+    def __init__(self, **attrs):
+        self.attrs = attrs
+        self.spans = []
+        self.counters = {}
+        self.depth = 0
+
+    def to_dict(self):
+        return dict(self.attrs, spans=self.spans, counters=self.counters)
+
+
+def span(name, **attrs):
+    """
+    time the enclosed block as a stage of the active trace; a shared no-op
+    context when no trace is active on this thread
+    """
+    trace = getattr(_local, 'trace', None)
+    if trace is None:
+        return _NO_SPAN
+
+    return Span(trace, name, attrs)
+
+
+def count(name, value=1):
+    """
+    add value to a counter of the active trace, if any
+    """
+    trace = getattr(_local, 'trace', None)
+    if trace is not None:
+        trace.counters[name] = trace.counters.get(name, 0) + value
+
+
+def active():
+    """
+    return:
+        returns True when a trace is recording on this thread, for
+        measurements that cost more than a span (e.g. payload sizes)
+    """
+    return getattr(_local, 'trace', None) is not None
+
+
+@contextmanager
+def tracing(enabled=True, log_path=TRACE_LOG, **attrs):
+    """
+    record the spans and counters of the enclosed block on this thread and
+    append them to log_path as one jsonl record
+
+    yield:
+        yields the Trace, or None when disabled
+    """
+    if not enabled:
+        yield None
+        return
+
+    trace = Trace(time=time.strftime("%Y-%m-%dT%H:%M:%S"), pid=os.getpid(), **attrs)
+    previous, _local.trace = getattr(_local, 'trace', None), trace
+    try:
+        yield trace
+    finally:
+        _local.trace = previous
+        if log_path:
+            line = json.dumps(trace.to_dict(), default=str) + "\n"
+            with _log_lock, open(log_path, "a") as f:
+                f.write(line)
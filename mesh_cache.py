@@ -0,0 +1,163 @@
+__author__ = "Hari Krishna Veerala"
+__credits__ = ["", ""]
+__license__ = ""
+__version__ = "1.0.1"
+__maintainer__ = ""
+__email__ = "veeralakrishna.com"
+__status__ = "Development" # Production/Development
+
+
+#---------------------------------------------------------------------------
+#                                imports
+#---------------------------------------------------------------------------
+
+import os
+import sys
+import threading
+import numpy as np
+
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from instrument import count
+
+
+#---------------------------------------------------------------------------
+#                                Mesh-Cache
+#---------------------------------------------------------------------------
+
+def nbytes(value):
+    """
+    estimate the memory held by a cached value: numpy buffers, strings and
+    the containers (tuple, list, dict) built from them
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if hasattr(value, 'nbytes'):  # e.g. mesh_index.PointTree
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(map(nbytes, value))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(map(nbytes, value.values()))
+
+    return sys.getsizeof(value)
+
+
+def file_key(file_path):
+    """
+    return:
+        returns (path, mtime) so entries built from an older version of the
+        file are never hit again
+    """
+    return (str(file_path), os.stat(file_path).st_mtime_ns)
+
+
+class MeshCache:
+    """
+    Process-wide LRU cache for parsed meshes and computed face colors.
+
+    Every Streamlit session runs in a thread of the same process, so one
+    instance is shared by all reruns and sessions. Entries are evicted,
+    least recently used first, once their total size exceeds max_bytes.
+
+    Inside `with cache.background():` the calling thread neither promotes
+    the entries it reads nor stores its own as recently used: they go in
+    at the cold end and are the first evicted, so background work (e.g.
+    prefetch) never pushes out what a session is looking at.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            if not self.in_background():
+                self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key, value):
+        size = nbytes(value)
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            # a value larger than the whole budget is returned but not kept
+            if size > self.max_bytes:
+                return value
+            # make room first, so a cold entry is not evicted by itself
+            while self.nbytes + size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.nbytes -= evicted_size
+                self.evictions += 1
+            self._entries[key] = (value, size)
+            self.nbytes += size
+            if self.in_background():
+                self._entries.move_to_end(key, last=False)
+
+        return value
+
+    def in_background(self):
+        return getattr(self._local, 'background', False)
+
+    @contextmanager
+    def background(self):
+        """
+        run the reads and writes of the calling thread as background work,
+        see the class docstring
+        """
+        previous = self.in_background()
+        self._local.background = True
+        try:
+            yield self
+        finally:
+            self._local.background = previous
+
+    def get_or_compute(self, key, compute):
+        """
+        return the cached value of key, computing and storing it on a miss.
+        compute runs outside the lock, so a slow load never blocks other
+        sessions reading the cache
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            count('cache_misses')
+            value = self.put(key, compute())
+        else:
+            count('cache_hits')
+
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        return dict(entries=len(self._entries),
+                    nbytes=self.nbytes,
+                    max_bytes=self.max_bytes,
+                    hits=self.hits,
+                    misses=self.misses,
+                    evictions=self.evictions)
+
+
+_MISSING = object()
+
+# budget in MB, configurable through the environment
+mesh_cache = MeshCache(int(os.environ.get("MESH_CACHE_MB", 512)) * 2**20)
@@ -0,0 +1,215 @@
+__author__ = "Hari Krishna Veerala"
+__credits__ = ["", ""]
+__license__ = ""
+__version__ = "1.0.1"
+__maintainer__ = ""
+__email__ = "veeralakrishna.com"
+__status__ = "Development" # Production/Development
+
+
+#---------------------------------------------------------------------------
+#                                imports
+#---------------------------------------------------------------------------
+
+import numpy as np
+
+from mesh_ops import face_normals, boundary_edges
+
+
+#---------------------------------------------------------------------------
+#                                Scalar-Fields
+#---------------------------------------------------------------------------
+
+def _normalize(vectors):
+    """
+    return:
+        returns the vectors scaled to unit length; zero vectors stay zero
+    """
+    length = np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    return np.divide(vectors, length, out=np.zeros_like(vectors), where=length > 0)
+
+
+def _scatter_add(index, values, n_vertices):
+    """
+    return:
+        returns the sum of values per vertex; index holds the vertex of
+        every value (or row of values)
+    """
+    index = np.asarray(index).ravel()
+    values = values.reshape(len(index), -1)
+    sums = np.column_stack([np.bincount(index, values[:, c], minlength=n_vertices)
+                            for c in range(values.shape[1])])
+
+    return sums[:, 0] if sums.shape[1] == 1 else sums
+
+
+def _vertex_sum(triangles, face_values, n_vertices):
+    """
+    return:
+        returns the sum of face_values over the faces around every vertex
+    """
+    return _scatter_add(triangles, np.repeat(face_values, 3, axis=0), n_vertices)
+
+
+def face_areas(vertices, triangles):
+    """
+    return:
+        returns the area of every face
+    """
+    return 0.5 * np.linalg.norm(face_normals(vertices, triangles), axis=1)
+
+
+def vertex_normals(vertices, triangles):
+    """
+    return:
+        returns the unit normal of every vertex, the sum of the normals of
+        the faces around it weighted by their area
+    """
+    # the cross product is already scaled by twice the face area
+    return _normalize(_vertex_sum(triangles, face_normals(vertices, triangles), len(vertices)))
+
+
+def aspect_ratios(vertices, triangles):
+    """
+    return:
+        returns the aspect ratio of every face, longest edge over the
+        diameter of the inscribed circle scaled so an equilateral triangle
+        is 1; degenerate faces are inf
+    """
+    tri = vertices[triangles]
+    lengths = np.linalg.norm(tri[:, [1, 2, 0]] - tri[:, [2, 0, 1]], axis=2)
+    area = face_areas(vertices, triangles)
+
+    # inradius r = area / semi-perimeter, ratio = longest / (2 sqrt(3) r)
+    numerator = lengths.max(axis=1) * lengths.sum(axis=1)
+    denominator = 4 * np.sqrt(3) * area
+
+    return np.divide(numerator, denominator,
+                     out=np.full(len(triangles), np.inf), where=denominator > 0)
+
+
+def corner_angles(vertices, triangles):
+    """
+    return:
+        returns a (no_triangles, 3) array with the interior angle at every
+        corner of every face
+    """
+    tri = vertices[triangles]
+    # u, v are the two edges leaving each corner
+    u = tri[:, [1, 2, 0]] - tri
+    v = tri[:, [2, 0, 1]] - tri
+
+    return np.arctan2(np.linalg.norm(np.cross(u, v), axis=2), (u * v).sum(axis=2))
+
+
+def vertex_areas(vertices, triangles):
+    """
+    return:
+        returns the barycentric area of every vertex, a third of the area
+        of the faces around it
+    """
+    return _vertex_sum(triangles, face_areas(vertices, triangles) / 3, len(vertices))
+
+
+def gaussian_curvature(vertices, triangles):
+    """
+    return:
+        returns the discrete gaussian curvature of every vertex, its angle
+        deficit over its barycentric area; boundary vertices measure the
+        deficit against a half turn
+    """
+    angles = corner_angles(vertices, triangles)
+    angle_sum = np.bincount(triangles.ravel(), angles.ravel(), minlength=len(vertices))
+
+    full_turn = np.full(len(vertices), 2 * np.pi)
+    full_turn[boundary_edges(triangles).ravel()] = np.pi
+    area = vertex_areas(vertices, triangles)
+
+    return np.divide(full_turn - angle_sum, area, out=np.zeros(len(vertices)), where=area > 0)
+
+
+def mean_curvature(vertices, triangles):
+    """
+    return:
+        returns the discrete mean curvature of every vertex from the
+        cotangent laplacian, positive where the surface is convex along
+        its vertex normal
+    """
+    tri = vertices[triangles]
+    u = tri[:, [1, 2, 0]] - tri
+    v = tri[:, [2, 0, 1]] - tri
+    cross = np.linalg.norm(np.cross(u, v), axis=2)
+    cot = np.divide((u * v).sum(axis=2), cross, out=np.zeros_like(cross), where=cross > 0)
+
+    # the cotangent at corner c weights the opposite edge (c+1, c+2)
+    a, b = triangles[:, [1, 2, 0]], triangles[:, [2, 0, 1]]
+    edge = (vertices[b] - vertices[a]) * cot[..., None]
+    laplacian = _scatter_add(a, edge, len(vertices)) - _scatter_add(b, edge, len(vertices))
+    area = vertex_areas(vertices, triangles)
+    normals = vertex_normals(vertices, triangles)
+
+    # laplacian / (2 area) is the mean curvature normal -2 H n
+    curvature = (laplacian * normals).sum(axis=1)
+
+    return np.divide(-curvature, 4 * area, out=np.zeros(len(vertices)), where=area > 0)
+
+
+def centroid_distances(vertices, triangles):
+    """
+    return:
+        returns the distance of every vertex from the centroid of the
+        vertices used by the faces
+    """
+    used = np.bincount(triangles.ravel(), minlength=len(vertices)) > 0
+    centroid = vertices[used].mean(axis=0) if used.any() else vertices.mean(axis=0)
+
+    return np.linalg.norm(vertices - centroid, axis=1)
+
+
+# every field offered by the "color by" selector: (function, location)
+# with location 'cell' for one value per face and 'vertex' per vertex
+SCALAR_FIELDS = {
+    'normal_z': (lambda vertices, triangles: vertex_normals(vertices, triangles)[:, 2], 'vertex'),
+    'area': (face_areas, 'cell'),
+    'aspect_ratio': (aspect_ratios, 'cell'),
+    'gaussian_curvature': (gaussian_curvature, 'vertex'),
+    'mean_curvature': (mean_curvature, 'vertex'),
+    'centroid_distance': (centroid_distances, 'vertex'),
+}
+
+
+def scalar_field(name, vertices, triangles):
+    """
+    params:
+        name is a key of SCALAR_FIELDS
+        vertices is a float array of shape (no_vertices, 3)
+        triangles is an int array of shape (no_triangles, 3)
+
+    return:
+        returns the field values and their location, 'cell' or 'vertex'
+    """
+    if name not in SCALAR_FIELDS:
+        raise ValueError(f'unknown scalar field {name!r}')
+
+    function, location = SCALAR_FIELDS[name]
+
+    return function(np.asarray(vertices, dtype=float), np.asarray(triangles)), location
+
+
+def field_range(values, percentile=2):
+    """
+    return:
+        returns (low, high), the percentile range of the finite values, so
+        a few extreme faces or vertices (curvature spikes, slivers) do not
+        flatten the colors of the rest
+    """
+    finite = values[np.isfinite(values)]
+    if not len(finite):
+        return 0.0, 1.0
+
+    low, high = np.percentile(finite, [percentile, 100 - percentile])
+    if low == high:
+        low, high = finite.min(), finite.max()
+
+    return float(low), float(high)
@@ -0,0 +1,242 @@
+__author__ = "Hari Krishna Veerala"
+__credits__ = ["", ""]
+__license__ = ""
+__version__ = "1.0.1"
+__maintainer__ = ""
+__email__ = "veeralakrishna.com"
+__status__ = "Development" # Production/Development
+
+
+#---------------------------------------------------------------------------
+#                                imports
+#---------------------------------------------------------------------------
+
+import numpy as np
+
+
+#---------------------------------------------------------------------------
+#                                Spatial-Index
+#---------------------------------------------------------------------------
+
+def box_distance2(points, lo, hi):
+    """
+    return:
+        returns the squared distance of every point to its axis aligned box
+        (lo, hi); 0 inside the box
+    """
+    gap = np.maximum(lo - points, 0) + np.maximum(points - hi, 0)
+
+    return (gap * gap).sum(axis=-1)
+
+
+def _ranges(starts, stops):
+    """
+    return:
+        returns the concatenation of arange(start, stop) for every pair
+    """
+    lengths = stops - starts
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+
+    return np.arange(lengths.sum()) + offsets
+
+
+class PointTree:
+    """
+    Static k-d tree over the vertices of a mesh, with the bounding box of
+    every node (a bounding volume hierarchy over points).
+
+    The tree is complete: level d has 2**d nodes, the children of node k
+    are 2k and 2k + 1 of the next level, and every node covers a contiguous
+    range of the points sorted by order. Building splits every node of a
+    level at once at the median of its widest axis, and the queries walk
+    the tree one level at a time for all (query, node) pairs together, so
+    nothing loops over points or nodes in Python.
+    """
+
+    def __init__(self, points, leaf_size=32):
+        points = np.asarray(points, dtype=float)
+        n = len(points)
+        if not n:
+            raise ValueError('cannot index an empty point set')
+        self.depth = int(np.ceil(np.log2(n / leaf_size))) if n > leaf_size else 0
+
+        # the rank of every point along every axis, with its index as a
+        # fourth row: sorting (node, rank) integer keys is much faster than
+        # a lexsort of the coordinates
+        rank = np.empty((4, n), dtype=np.int64)
+        for axis in range(3):
+            rank[axis, np.argsort(points[:, axis])] = np.arange(n)
+        rank[3] = np.arange(n)
+
+        # points and ranks are kept in tree order; every level only moves
+        # them within their node, so the gathers stay mostly cache local
+        sorted_points = points
+        starts = np.array([0, n])
+        for _ in range(self.depth):
+            lo = np.minimum.reduceat(sorted_points, starts[:-1])
+            hi = np.maximum.reduceat(sorted_points, starts[:-1])
+            axis = (hi - lo).argmax(axis=1)
+
+            node = np.repeat(np.arange(len(starts) - 1, dtype=np.int64), np.diff(starts))
+            move = np.argsort(node * n + np.choose(axis[node], rank[:3]))
+            sorted_points, rank = sorted_points[move], rank[:, move]
+
+            middle = (starts[:-1] + starts[1:]) // 2
+            starts = np.append(np.column_stack((starts[:-1], middle)).ravel(), n)
+
+        order = rank[3]
+        self.points = points
+        self.order = order
+        self.starts = starts
+
+        # leaves padded to the same size, padding points are at infinity
+        sizes = np.diff(starts)
+        slot = np.arange(sizes.max())
+        valid = slot < sizes[:, None]
+        self.leaf_index = np.where(valid, order[np.minimum(starts[:-1, None] + slot, n - 1)], -1)
+        self.leaf_points = np.where(valid[..., None], points[np.maximum(self.leaf_index, 0)], np.inf)
+
+        # node boxes, from the leaves up
+        lo = np.where(valid[..., None], self.leaf_points, np.inf).min(axis=1)
+        hi = np.where(valid[..., None], self.leaf_points, -np.inf).max(axis=1)
+        self.lo, self.hi = [lo], [hi]
+        for _ in range(self.depth):
+            lo = np.minimum(lo[0::2], lo[1::2])
+            hi = np.maximum(hi[0::2], hi[1::2])
+            self.lo.insert(0, lo)
+            self.hi.insert(0, hi)
+
+    def __len__(self):
+        return len(self.points)
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in
+                   [self.points, self.order, self.starts, self.leaf_index, self.leaf_points]
+                   + self.lo + self.hi)
+
+    def nearest(self, queries):
+        """
+        params:
+            queries is an array of shape (no_queries, 3)
+
+        return:
+            returns the distance to and the index of the nearest point of
+            every query
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=float))
+        n_queries = len(queries)
+
+        # an upper bound first: descend to the closer child at every level
+        node = np.zeros(n_queries, dtype=np.intp)
+        for level in range(1, self.depth + 1):
+            left, right = 2 * node, 2 * node + 1
+            closer = (box_distance2(queries, self.lo[level][left], self.hi[level][left]) <=
+                      box_distance2(queries, self.lo[level][right], self.hi[level][right]))
+            node = np.where(closer, left, right)
+
+        best2, best = self._scan(queries, np.arange(n_queries), node)
+
+        # then every leaf whose box is closer than the bound
+        query, node = np.arange(n_queries), np.zeros(n_queries, dtype=np.intp)
+        for level in range(self.depth + 1):
+            keep = box_distance2(queries[query], self.lo[level][node], self.hi[level][node]) < best2[query]
+            query, node = query[keep], node[keep]
+            if level < self.depth:
+                query = np.repeat(query, 2)
+                node = (2 * node[:, None] + np.arange(2)).ravel()
+
+        distance2, index = self._scan(queries, query, node)
+        # the closest leaf of every query that still has one
+        order = np.lexsort((distance2, query))
+        first = order[np.unique(query[order], return_index=True)[1]]
+        closer = first[distance2[first] < best2[query[first]]]
+        best2[query[closer]] = distance2[closer]
+        best[query[closer]] = index[closer]
+
+        return np.sqrt(best2), best
+
+    def _scan(self, queries, query, leaf):
+        """
+        return:
+            returns the squared distance and index of the closest point of
+            leaf to queries[query], for every (query, leaf) pair
+        """
+        delta = self.leaf_points[leaf] - queries[query, None]
+        distance2 = (delta * delta).sum(axis=2)
+        slot = distance2.argmin(axis=1)
+        rows = np.arange(len(leaf))
+
+        return distance2[rows, slot], self.leaf_index[leaf, slot]
+
+    def _region(self, disjoint, contained, inside):
+        """
+        walk the tree for one region: drop the nodes disjoint from it, take
+        the nodes it contains whole and test the points of the leaves it
+        cuts
+
+        return:
+            returns the sorted indices of the points inside the region
+        """
+        found = []
+        node = np.zeros(1, dtype=np.intp)
+        for level in range(self.depth + 1):
+            lo, hi = self.lo[level][node], self.hi[level][node]
+            node = node[~disjoint(lo, hi)]
+            whole = contained(self.lo[level][node], self.hi[level][node])
+
+            # a node of this level spans 2**(depth - level) leaves
+            first = node[whole] * 2 ** (self.depth - level)
+            last = first + 2 ** (self.depth - level)
+            found.append(self.order[_ranges(self.starts[first], self.starts[last])])
+
+            node = node[~whole]
+            if level < self.depth:
+                node = (2 * node[:, None] + np.arange(2)).ravel()
+
+        index = self.leaf_index[node].ravel()
+        index = index[index >= 0]
+        found.append(index[inside(self.points[index])])
+
+        return np.sort(np.concatenate(found))
+
+    def in_box(self, lo, hi):
+        """
+        return:
+            returns the sorted indices of the points inside the box
+        """
+        lo, hi = np.asarray(lo, dtype=float), np.asarray(hi, dtype=float)
+
+        return self._region(
+            lambda node_lo, node_hi: ((node_hi < lo) | (node_lo > hi)).any(axis=1),
+            lambda node_lo, node_hi: ((node_lo >= lo) & (node_hi <= hi)).all(axis=1),
+            lambda points: ((points >= lo) & (points <= hi)).all(axis=1))
+
+    def in_sphere(self, center, radius):
+        """
+        return:
+            returns the sorted indices of the points inside the sphere
+        """
+        center = np.asarray(center, dtype=float)
+        radius2 = float(radius) ** 2
+
+        def farthest2(node_lo, node_hi):
+            corner = np.maximum(np.abs(node_lo - center), np.abs(node_hi - center))
+            return (corner * corner).sum(axis=1)
+
+        return self._region(
+            lambda node_lo, node_hi: box_distance2(center, node_lo, node_hi) > radius2,
+            lambda node_lo, node_hi: farthest2(node_lo, node_hi) <= radius2,
+            lambda points: ((points - center) ** 2).sum(axis=1) <= radius2)
+
+
+def faces_of(triangles, vertex_index, n_vertices):
+    """
+    return:
+        returns the indices of the faces whose three vertices are all in
+        vertex_index
+    """
+    selected = np.zeros(n_vertices, dtype=bool)
+    selected[vertex_index] = True
+
+    return np.flatnonzero(selected[triangles].all(axis=1))
@@ -0,0 +1,682 @@
+__author__ = "Hari Krishna Veerala"
+__credits__ = ["", ""]
+__license__ = ""
+__version__ = "1.0.1"
+__maintainer__ = ""
+__email__ = "veeralakrishna.com"
+__status__ = "Development" # Production/Development
+
+
+#---------------------------------------------------------------------------
+#                                imports
+#---------------------------------------------------------------------------
+
+import io
+import os
+import re
+import json
+import struct
+import threading
+import numpy as np
+
+from itertools import islice
+
+
+#---------------------------------------------------------------------------
+#                                Mesh-Formats
+#---------------------------------------------------------------------------
+
+# file types accepted by read_mesh
+MESH_FORMATS = ['.ply', '.obj', '.stl']
+
+# limits of an uploaded mesh, configurable through the environment
+UPLOAD_LIMITS = dict(max_bytes=int(os.environ.get("UPLOAD_MAX_MB", 200)) * 2**20,
+                     max_vertices=int(os.environ.get("UPLOAD_MAX_VERTICES", 5_000_000)),
+                     max_faces=int(os.environ.get("UPLOAD_MAX_FACES", 10_000_000)))
+
+# text formats are parsed this many lines at a time
+CHUNK_LINES = 2**16
+
+PLY_TYPES = {'char': 'i1', 'int8': 'i1', 'uchar': 'u1', 'uint8': 'u1',
+             'short': 'i2', 'int16': 'i2', 'ushort': 'u2', 'uint16': 'u2',
+             'int': 'i4', 'int32': 'i4', 'uint': 'u4', 'uint32': 'u4',
+             'float': 'f4', 'float32': 'f4', 'double': 'f8', 'float64': 'f8'}
+
+
+class MeshFormatError(ValueError):
+    """
+    the file is malformed or uses a layout the reader does not support
+    """
+
+
+class MeshLimitError(MeshFormatError):
+    """
+    the file is over the byte, vertex or face limit
+    """
+
+
+class _Unsupported(Exception):
+    """
+    raised by a fast path that does not apply; the caller falls back
+    """
+
+
+def check_limits(limits, n_bytes=None, vertices=None, faces=None):
+    """
+    raise MeshLimitError when a count is over its limit; counts left None
+    are not checked, and nothing is when limits is None (local assets)
+    """
+    if limits is None:
+        return
+    for count, limit, what in ((n_bytes, 'max_bytes', 'bytes'),
+                               (vertices, 'max_vertices', 'vertices'),
+                               (faces, 'max_faces', 'faces')):
+        if count is not None and count > limits[limit]:
+            raise MeshLimitError(f'{count:,} {what} is over the limit of {limits[limit]:,}')
+
+
+def file_buffer(file):
+    """
+    return:
+        returns the content of a binary file object without copying it
+        when possible: the buffer of an in-memory file (e.g. a streamlit
+        upload), a read-only memory map of a file on disk
+    """
+    if hasattr(file, 'getbuffer'):
+        return file.getbuffer()
+    try:
+        # pages are only read as the arrays taken from it touch them
+        return np.memmap(file, mode='r')
+    except (AttributeError, OSError, ValueError):  # no fileno, empty file
+        file.seek(0)
+        return file.read()
+
+
+def fan_triangulate(faces):
+    """
+    params:
+        faces is either a numpy array of shape (no_faces, n) or a sequence of
+        index arrays of any length (triangles, quads, n-gons)
+
+    return:
+        returns an int array of shape (no_triangles, 3); every polygon
+        (v0, v1, ..., vn) is split into the fan (v0, vk, vk+1)
+    """
+    if isinstance(faces, np.ndarray) and faces.dtype != object and faces.ndim == 2:
+        if faces.shape[1] == 3:
+            return faces
+        flat = faces.ravel()
+        lengths = np.full(len(faces), faces.shape[1])
+    else:
+        lengths = np.fromiter(map(len, faces), dtype=np.intp, count=len(faces))
+        if len(faces) and (lengths == 3).all():
+            return np.vstack(faces)
+        flat = np.concatenate(faces) if len(faces) else np.empty(0, dtype=np.intp)
+
+    # polygons with less than 3 vertices do not span a surface
+    n_tri = np.maximum(lengths - 2, 0)
+    starts = np.cumsum(lengths) - lengths
+    face_of_tri = np.repeat(np.arange(len(lengths)), n_tri)
+    # position of each triangle inside its own fan: 1 .. n-2
+    k = np.arange(n_tri.sum()) - np.repeat(np.cumsum(n_tri) - n_tri, n_tri) + 1
+    first = starts[face_of_tri]
+
+    return np.stack((flat[first], flat[first + k], flat[first + k + 1]), axis=1)
+
+
+def ply_arrays(plydata):
+    """
+    params:
+        plydata is a parsed plyfile.PlyData
+
+    return:
+        returns x, y, z as contiguous arrays taken straight from the vertex
+        element, and the faces as an int array of shape (no_triangles, 3)
+    """
+    # binary files may be big-endian, convert to the native byte order
+    vertex = plydata['vertex'].data
+    x, y, z = (np.ascontiguousarray(vertex[c],
+                                    dtype=vertex.dtype[c].newbyteorder('='))
+               for c in ('x', 'y', 'z'))
+
+    # the vertex index list is the first property of the face element
+    face = plydata['face'].data
+    triangles = fan_triangulate(face[face.dtype.names[0]])
+
+    return x, y, z, triangles.astype(np.int32, copy=False)
+
+
+def _parse_floats(lines, columns):
+    """
+    return:
+        returns the leading columns of whitespace separated number rows
+        as a float array of shape (no_lines, columns)
+    """
+    tokens = b' '.join(lines).split()
+    if len(tokens) != len(lines) * columns:
+        raise _Unsupported
+    try:
+        return np.array(tokens, dtype=float).reshape(len(lines), columns)
+    except ValueError as e:
+        raise MeshFormatError(str(e))
+
+
+def _ply_polygon_rows(lines):
+    """
+    return:
+        returns the faces of ascii .ply rows "n i0 i1 ... [more]" as
+        triangles, see fan_triangulate; one row at a time, for the chunks
+        that are not all triangles
+    """
+    try:
+        rows = [np.array(line.split(), dtype=np.int64) for line in lines]
+        return fan_triangulate([row[1:1 + row[0]] for row in rows])
+    except (ValueError, IndexError) as e:
+        raise MeshFormatError(f'bad ply face row: {e}')
+
+
+#---------------------------------------------------------------------------
+#                                PLY
+#---------------------------------------------------------------------------
+
+def read_ply_header(file, max_lines=1000):
+    """
+    read the header of a .ply file, leaving file at the first data byte
+
+    return:
+        returns the format ('ascii', 'binary_little_endian' or
+        'binary_big_endian') and the elements as a list of
+        (name, count, properties); a property is (name, type) or, for a
+        list, (name, (count type, item type))
+    """
+    if file.readline().strip() != b'ply':
+        raise MeshFormatError('not a ply file')
+
+    fmt, elements = None, []
+    for _ in range(max_lines):
+        words = file.readline().split()
+        if not words or words[0] in (b'comment', b'obj_info'):
+            continue
+        words = [word.decode('ascii', 'replace') for word in words]
+        try:
+            if words[0] == 'format':
+                fmt = words[1]
+            elif words[0] == 'element':
+                elements.append((words[1], int(words[2]), []))
+            elif words[0] == 'property' and words[1] == 'list':
+                elements[-1][2].append((words[4], (PLY_TYPES[words[2]], PLY_TYPES[words[3]])))
+            elif words[0] == 'property':
+                elements[-1][2].append((words[2], PLY_TYPES[words[1]]))
+            elif words[0] == 'end_header':
+                break
+        except (IndexError, KeyError, ValueError):
+            raise MeshFormatError(f'bad ply header line: {" ".join(words)}')
+    else:
+        raise MeshFormatError('ply header without end_header')
+
+    if fmt not in ('ascii', 'binary_little_endian', 'binary_big_endian'):
+        raise MeshFormatError(f'unknown ply format {fmt!r}')
+
+    return fmt, elements
+
+
+def _ply_counts(elements):
+    counts = {name: count for name, count, _ in elements}
+    if 'vertex' not in counts or 'face' not in counts:
+        raise MeshFormatError('a ply mesh needs vertex and face elements')
+
+    return counts['vertex'], counts['face']
+
+
+def _ply_vertex_columns(properties):
+    names = [name for name, _ in properties]
+    if not {'x', 'y', 'z'} <= set(names):
+        raise MeshFormatError('ply vertices without x, y, z')
+
+    return [names.index(c) for c in ('x', 'y', 'z')]
+
+
+def ply_binary(buffer, offset, fmt, elements):
+    """
+    read the elements of a binary .ply straight from the buffer with
+    np.frombuffer, no per-row python work; applies when the vertices have
+    no list properties and every face is a triangle
+
+    return:
+        returns the vertices as float (no_vertices, 3) and the triangles
+    """
+    endian = '<' if fmt == 'binary_little_endian' else '>'
+    vertices = triangles = None
+    for name, count, properties in elements:
+        fields = []
+        for prop, kind in properties:
+            if isinstance(kind, tuple):
+                if name != 'face' or prop != properties[0][0]:
+                    raise _Unsupported
+                # fixed width triangles: the count, then three indices
+                fields += [('n', endian + kind[0]), ('v', endian + kind[1], (3,))]
+            else:
+                fields.append((prop, endian + kind))
+        dtype = np.dtype(fields)
+
+        try:
+            data = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+        except ValueError:
+            raise MeshFormatError(f'ply file truncated in element {name!r}')
+        offset += dtype.itemsize * count
+
+        if name == 'vertex':
+            _ply_vertex_columns(properties)
+            vertices = np.column_stack([data[c].astype(float) for c in ('x', 'y', 'z')])
+        elif name == 'face':
+            if 'v' not in dtype.names or not (data['n'] == 3).all():
+                raise _Unsupported
+            triangles = data['v'].astype(np.int32)
+
+    return vertices, triangles
+
+
+def ply_ascii(file, elements, limits):
+    """
+    read the elements of an ascii .ply CHUNK_LINES rows at a time
+
+    return:
+        returns the vertices as float (no_vertices, 3) and the triangles
+    """
+    vertices, triangles = [], []
+    for name, count, properties in elements:
+        columns = _ply_vertex_columns(properties) if name == 'vertex' else None
+        if name == 'vertex' and any(isinstance(kind, tuple) for _, kind in properties):
+            raise _Unsupported
+
+        for start in range(0, count, CHUNK_LINES):
+            lines = list(islice(file, min(CHUNK_LINES, count - start)))
+            if len(lines) < min(CHUNK_LINES, count - start):
+                raise MeshFormatError(f'ply file truncated in element {name!r}')
+
+            if name == 'vertex':
+                vertices.append(_parse_floats(lines, len(properties))[:, columns])
+            elif name == 'face':
+                if len(properties) != 1:
+                    triangles.append(_ply_polygon_rows(lines))
+                    continue
+                try:
+                    rows = _parse_floats(lines, 4).astype(np.int64)
+                except _Unsupported:
+                    rows = None
+                if rows is not None and (rows[:, 0] == 3).all():
+                    triangles.append(rows[:, 1:])
+                else:
+                    triangles.append(_ply_polygon_rows(lines))
+                check_limits(limits, faces=sum(map(len, triangles)))
+
+    return (np.concatenate(vertices) if vertices else np.zeros((0, 3)),
+            np.concatenate(triangles).astype(np.int32) if triangles else np.zeros((0, 3), np.int32))
+
+
+def read_ply(file, limits=UPLOAD_LIMITS):
+    """
+    read an ascii or binary .ply; layouts the fast readers do not handle
+    (list properties other than the face indices, binary polygons) fall
+    back to plyfile
+
+    return:
+        returns the vertices as float (no_vertices, 3) and the triangles
+    """
+    fmt, elements = read_ply_header(file)
+    n_vertices, n_faces = _ply_counts(elements)
+    check_limits(limits, vertices=n_vertices, faces=n_faces)
+    data_start = file.tell()
+
+    try:
+        if fmt == 'ascii':
+            return ply_ascii(file, elements, limits)
+        return ply_binary(file_buffer(file), data_start, fmt, elements)
+    except _Unsupported:
+        from plyfile import PlyData, PlyParseError
+
+        file.seek(0)
+        try:
+            x, y, z, triangles = ply_arrays(PlyData.read(file))
+        except PlyParseError as e:
+            raise MeshFormatError(f'bad .ply file: {e}')
+        triangles = triangles.astype(np.int32)
+        check_limits(limits, faces=len(triangles))
+
+        return np.column_stack((x, y, z)).astype(float), triangles
+
+
+# canonical ply type name of every numpy type, for writing headers
+PLY_NAMES = {'i1': 'char', 'u1': 'uchar', 'i2': 'short', 'u2': 'ushort',
+             'i4': 'int', 'u4': 'uint', 'f4': 'float', 'f8': 'double'}
+
+# fixed width triangle faces: the count 3, then the three vertex indices
+PLY_TRIANGLE = np.dtype([('n', 'u1'), ('v', '<i4', (3,))])
+
+
+def is_binary_triangle_ply(file_path):
+    """
+    return:
+        returns True when the .ply is already in the layout written by
+        write_ply_binary: little endian, triangle faces of fixed width
+    """
+    with open(file_path, 'rb') as f:
+        fmt, elements = read_ply_header(f)
+    faces = [properties for name, _, properties in elements if name == 'face']
+
+    return (fmt == 'binary_little_endian' and len(faces) == 1 and
+            [kind for _, kind in faces[0]] == [('u1', 'i4')])
+
+
+def ply_chunks(vertex, triangles, comments=()):
+    """
+    the parts of a binary_little_endian .ply with fixed width triangle
+    faces, the layout ply_binary maps without any per-row work
+
+    params:
+        vertex is a structured array with at least the fields x, y, z;
+        every scalar field is written as a vertex property
+        triangles is an int array of shape (no_triangles, 3)
+        comments are written to the header
+
+    return:
+        returns the header and the two element blocks as byte buffers
+    """
+    try:
+        vertex_dtype = np.dtype([(name, '<' + vertex.dtype[name].str[1:])
+                                 for name in vertex.dtype.names])
+        properties = [f"property {PLY_NAMES[vertex_dtype[name].str[1:]]} {name}\n"
+                      for name in vertex_dtype.names]
+    except KeyError as e:
+        raise MeshFormatError(f'no ply type for the vertex property type {e}')
+
+    faces = np.empty(len(triangles), dtype=PLY_TRIANGLE)
+    faces['n'] = 3
+    faces['v'] = triangles
+
+    header = (["ply\n", "format binary_little_endian 1.0\n"] +
+              [f"comment {comment}\n" for comment in comments] +
+              [f"element vertex {len(vertex)}\n"] + properties +
+              [f"element face {len(faces)}\n",
+               "property list uchar int vertex_indices\n",
+               "end_header\n"])
+
+    return ["".join(header).encode('ascii'), vertex.astype(vertex_dtype, copy=False), faces]
+
+
+def write_ply_binary(file, vertex, triangles, comments=()):
+    """
+    write a binary .ply to the binary file object file, see ply_chunks
+    """
+    for chunk in ply_chunks(vertex, triangles, comments):
+        file.write(chunk)
+
+
+def convert_ply(src_path, dst_path=None):
+    """
+    rewrite a .ply as binary_little_endian with fixed width triangle faces;
+    polygons are fan triangulated, the vertex properties and comments are
+    kept, other face properties and elements are dropped
+
+    params:
+        dst_path defaults to src_path; the file is written under a
+        temporary name and moved in place
+
+    return:
+        returns the vertex and triangle counts and the file sizes
+    """
+    from plyfile import PlyData
+
+    dst_path = str(dst_path or src_path)
+    src_bytes = os.path.getsize(src_path)
+    plydata = PlyData.read(str(src_path))
+    vertex = plydata['vertex'].data
+    if any(vertex.dtype[name].shape or vertex.dtype[name] == object for name in vertex.dtype.names):
+        raise MeshFormatError('list vertex properties are not supported')
+    _, _, _, triangles = ply_arrays(plydata)
+
+    tmp_path = f"{dst_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        write_ply_binary(f, vertex, triangles, plydata.comments)
+    os.replace(tmp_path, dst_path)
+
+    return dict(vertices=len(vertex), triangles=len(triangles),
+                src_bytes=src_bytes, dst_bytes=os.path.getsize(dst_path))
+
+
+#---------------------------------------------------------------------------
+#                                STL
+#---------------------------------------------------------------------------
+
+STL_RECORD = np.dtype([('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)), ('attributes', '<u2')])
+
+
+def weld_exact(corners):
+    """
+    params:
+        corners is a float array of shape (no_triangles, 3, 3), three
+        vertices per face as stored in a .stl
+
+    return:
+        returns the distinct vertices and the triangles indexing them
+    """
+    corners = np.ascontiguousarray(corners.reshape(-1, 3))
+    keys = corners.view(np.dtype((np.void, corners.dtype.itemsize * 3))).ravel()
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+
+    return corners[first].astype(float), inverse.reshape(-1, 3).astype(np.int32)
+
+
+def read_stl(file, limits=UPLOAD_LIMITS):
+    """
+    read a binary .stl with np.frombuffer, or an ascii one CHUNK_LINES
+    lines at a time; the per-face vertices are welded
+
+    return:
+        returns the vertices as float (no_vertices, 3) and the triangles
+    """
+    buffer = file_buffer(file)
+    size = len(buffer)
+    n_faces = int(np.frombuffer(buffer, dtype='<u4', count=1, offset=80)[0]) if size >= 84 else -1
+
+    # ascii files start with "solid" too, the size tells them apart
+    if size == 84 + STL_RECORD.itemsize * n_faces:
+        check_limits(limits, vertices=3 * n_faces, faces=n_faces)
+        records = np.frombuffer(buffer, dtype=STL_RECORD, count=n_faces, offset=84)
+        return weld_exact(records['vertices'])
+
+    file.seek(0)
+    if not file.read(5).lower() == b'solid':
+        raise MeshFormatError('not an stl file')
+
+    corners = []
+    for lines in iter(lambda: list(islice(file, CHUNK_LINES)), []):
+        lines = [line.split(None, 1)[1] for line in lines if line.lstrip().startswith(b'vertex')]
+        if lines:
+            try:
+                corners.append(_parse_floats(lines, 3))
+            except _Unsupported:
+                raise MeshFormatError('stl vertex lines need three coordinates')
+        check_limits(limits, faces=sum(map(len, corners)) // 3)
+
+    corners = np.concatenate(corners) if corners else np.zeros((0, 3))
+    if len(corners) % 3:
+        raise MeshFormatError('stl facets need three vertices')
+
+    return weld_exact(corners.reshape(-1, 3, 3))
+
+
+#---------------------------------------------------------------------------
+#                                OBJ
+#---------------------------------------------------------------------------
+
+# texture and normal references of an obj face corner, e.g. "/2/7"
+_OBJ_REFERENCES = re.compile(rb'/\S*')
+
+
+def read_obj(file, limits=UPLOAD_LIMITS):
+    """
+    read the v and f records of a .obj CHUNK_LINES lines at a time;
+    polygons are fan triangulated, negative (relative) indices resolved
+
+    return:
+        returns the vertices as float (no_vertices, 3) and the triangles
+    """
+    vertices, triangles = [], []
+    n_vertices = 0
+    for lines in iter(lambda: list(islice(file, CHUNK_LINES)), []):
+        kind = [line[:2] for line in lines]
+        vertex_lines = [line[2:] for line, k in zip(lines, kind) if k in (b'v ', b'v\t')]
+        face_lines = [_OBJ_REFERENCES.sub(b'', line[2:]) for line, k in zip(lines, kind) if k in (b'f ', b'f\t')]
+
+        # vertices defined before every face line, for relative indices
+        is_vertex = np.array([k in (b'v ', b'v\t') for k in kind])
+        before = n_vertices + np.cumsum(is_vertex)[np.array([k in (b'f ', b'f\t') for k in kind], dtype=bool)]
+
+        if vertex_lines:
+            try:
+                vertices.append(_parse_floats(vertex_lines, 3))
+            except _Unsupported:
+                # extra columns (w, vertex colors)
+                vertices.append(np.array([line.split()[:3] for line in vertex_lines], dtype=float))
+            n_vertices += len(vertex_lines)
+
+        if face_lines:
+            try:
+                faces = _parse_floats(face_lines, 3).astype(np.int64)
+                relative = np.repeat(before, 3).reshape(-1, 3)
+            except _Unsupported:
+                rows = [np.array(line.split(), dtype=np.int64) for line in face_lines]
+                faces = fan_triangulate(rows)
+                lengths = np.fromiter(map(len, rows), dtype=np.intp, count=len(rows))
+                relative = np.repeat(before, np.maximum(lengths - 2, 0))[:, None]
+            triangles.append(np.where(faces < 0, faces + relative, faces - 1))
+
+        check_limits(limits, vertices=n_vertices, faces=sum(map(len, triangles)))
+
+    vertices = np.concatenate(vertices) if vertices else np.zeros((0, 3))
+    triangles = np.concatenate(triangles) if triangles else np.zeros((0, 3), np.int64)
+    if len(triangles) and (triangles.min() < 0 or triangles.max() >= len(vertices)):
+        raise MeshFormatError('obj face index out of range')
+
+    return vertices, triangles.astype(np.int32)
+
+
+def read_mesh(file, file_type, limits=UPLOAD_LIMITS):
+    """
+    params:
+        file is a binary file object, e.g. a streamlit UploadedFile
+        file_type is one of MESH_FORMATS
+        limits is a dict like UPLOAD_LIMITS
+
+    return:
+        returns the vertices as float (no_vertices, 3) and the triangles
+        as int32 (no_triangles, 3)
+    """
+    file.seek(0, io.SEEK_END)
+    check_limits(limits, n_bytes=file.tell())
+    file.seek(0)
+
+    readers = {'.ply': read_ply, '.obj': read_obj, '.stl': read_stl}
+    if file_type not in readers:
+        raise MeshFormatError(f'unsupported file type {file_type!r}')
+    vertices, triangles = readers[file_type](file, limits)
+
+    check_limits(limits, vertices=len(vertices), faces=len(triangles))
+    if not len(triangles):
+        raise MeshFormatError('the file has no faces')
+    if triangles.min() < 0 or triangles.max() >= len(vertices):
+        raise MeshFormatError('face index out of range')
+
+    return vertices, triangles
+
+
+#---------------------------------------------------------------------------
+#                                Mesh-Export
+#---------------------------------------------------------------------------
+
+def stl_chunks(vertices, triangles):
+    """
+    return:
+        returns the 80 byte header, the face count and the face records
+        of a binary .stl as byte buffers
+    """
+    corners = np.asarray(vertices, dtype=np.float32)[triangles]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    length = np.linalg.norm(normals, axis=1, keepdims=True)
+
+    records = np.zeros(len(triangles), dtype=STL_RECORD)
+    records['normal'] = np.divide(normals, length, out=np.zeros_like(normals), where=length > 0)
+    records['vertices'] = corners
+
+    # a binary header must not start with "solid", the ascii keyword
+    header = b"binary stl, Surface-Triangulation".ljust(80, b" ")
+
+    return [header, struct.pack("<I", len(records)), records]
+
+
+def glb_chunks(vertices, triangles):
+    """
+    the parts of a glTF 2.0 binary (.glb) holding one indexed triangle
+    mesh; the z up coordinates of the viewer are turned to the y up of
+    glTF
+
+    return:
+        returns the header, the json chunk and the binary chunk (float32
+        positions, then uint32 indices) as byte buffers
+    """
+    vertices = np.asarray(vertices, dtype=np.float32)
+    positions = np.column_stack((vertices[:, 0], vertices[:, 2], -vertices[:, 1]))
+    indices = np.ascontiguousarray(triangles, dtype='<u4')
+
+    gltf = dict(
+        asset=dict(version="2.0", generator="Surface-Triangulation"),
+        scene=0,
+        scenes=[dict(nodes=[0])],
+        nodes=[dict(mesh=0)],
+        meshes=[dict(primitives=[dict(attributes=dict(POSITION=0), indices=1, mode=4)])],
+        buffers=[dict(byteLength=positions.nbytes + indices.nbytes)],
+        bufferViews=[dict(buffer=0, byteOffset=0, byteLength=positions.nbytes, target=34962),
+                     dict(buffer=0, byteOffset=positions.nbytes, byteLength=indices.nbytes,
+                          target=34963)],
+        accessors=[dict(bufferView=0, componentType=5126, count=len(positions), type="VEC3",
+                        min=positions.min(axis=0).tolist(), max=positions.max(axis=0).tolist()),
+                   dict(bufferView=1, componentType=5125, count=indices.size, type="SCALAR")])
+
+    # chunks are 4 byte aligned: json padded with spaces; 12 byte vertices
+    # and 4 byte indices are aligned already
+    text = json.dumps(gltf, separators=(",", ":")).encode()
+    text += b" " * (-len(text) % 4)
+    binary_length = positions.nbytes + indices.nbytes
+    total = 12 + 8 + len(text) + 8 + binary_length
+
+    return [struct.pack("<4sII", b"glTF", 2, total),
+            struct.pack("<I4s", len(text), b"JSON"), text,
+            struct.pack("<I4s", binary_length, b"BIN\0"), positions.astype('<f4'), indices]
+
+
+# download formats: (file suffix, mime type, chunk writer)
+EXPORT_FORMATS = {
+    'ply': ('.ply', 'application/octet-stream',
+            lambda vertices, triangles: ply_chunks(
+                np.rec.fromarrays(np.asarray(vertices, dtype=np.float32).T, names='x,y,z'), triangles)),
+    'stl': ('.stl', 'model/stl', stl_chunks),
+    'glb': ('.glb', 'model/gltf-binary', glb_chunks),
+}
+
+
+def export_mesh(vertices, triangles, file_format):
+    """
+    params:
+        vertices is a float array of shape (no_vertices, 3)
+        triangles is an int array of shape (no_triangles, 3)
+        file_format is a key of EXPORT_FORMATS
+
+    return:
+        returns the file content; the chunks are joined straight from the
+        numpy buffers, with one copy
+    """
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f'unknown export format {file_format!r}')
+
+    return b"".join(EXPORT_FORMATS[file_format][2](vertices, triangles))
@@ -0,0 +1,385 @@
+__author__ = "Hari Krishna Veerala"
+__credits__ = ["", ""]
+__license__ = ""
+__version__ = "1.0.1"
+__maintainer__ = ""
+__email__ = "veeralakrishna.com"
+__status__ = "Development" # Production/Development
+
+
+#---------------------------------------------------------------------------
+#                                imports
+#---------------------------------------------------------------------------
+
+import numpy as np
+
+
+#---------------------------------------------------------------------------
+#                                Mesh-Decimation
+#---------------------------------------------------------------------------
+
+def unique_faces(triangles):
+    """
+    params:
+        triangles is an int array of shape (no_triangles, 3)
+
+    return:
+        returns the triangles without degenerate faces (a repeated vertex)
+        and without duplicates of the same vertex set, keeping the first
+        occurrence and its orientation
+    """
+    triangles = np.asarray(triangles)
+    a, b, c = triangles.T
+    triangles = triangles[(a != b) & (b != c) & (a != c)]
+
+    rows = np.sort(triangles, axis=1).astype(np.int64)
+    n = int(rows.max()) + 1 if rows.size else 1
+    if n < 2**21:
+        # one int64 key per face is much faster to unique than rows
+        _, first = np.unique((rows[:, 0] * n + rows[:, 1]) * n + rows[:, 2],
+                             return_index=True)
+    else:
+        _, first = np.unique(rows, axis=0, return_index=True)
+
+    return triangles[np.sort(first)]
+
+
+def compact_vertices(vertices, triangles):
+    """
+    drop the vertices no triangle refers to and reindex the triangles
+
+    return:
+        returns vertices, triangles
+    """
+    used, inverse = np.unique(triangles, return_inverse=True)
+
+    return vertices[used], inverse.reshape(triangles.shape)
+
+
+def cluster_vertices(vertices, triangles, cells):
+    """
+    vertex clustering: snap every vertex to a grid of cubic cells (cells
+    along the longest side of the bounding box), merge the vertices of each
+    cell into their mean and drop the faces that collapse
+
+    return:
+        returns vertices, triangles
+    """
+    lo = vertices.min(axis=0)
+    size = max(float((vertices.max(axis=0) - lo).max()) / cells, np.finfo(float).tiny)
+    grid = np.minimum(((vertices - lo) / size).astype(np.int64), cells - 1)
+    cell_id = (grid[:, 0] * cells + grid[:, 1]) * cells + grid[:, 2]
+
+    _, cluster, counts = np.unique(cell_id, return_inverse=True, return_counts=True)
+    cluster = cluster.ravel()
+    merged = np.stack([np.bincount(cluster, weights=vertices[:, c]) / counts
+                       for c in range(3)], axis=1)
+
+    triangles = unique_faces(cluster[triangles])
+
+    return compact_vertices(merged.astype(vertices.dtype), triangles)
+
+
+def decimate(vertices, triangles, max_triangles):
+    """
+    params:
+        vertices is a float array of shape (no_points, 3)
+        triangles is an int array of shape (no_triangles, 3)
+        max_triangles is the triangle budget
+
+    return:
+        returns the vertices and triangles of the finest vertex clustering
+        that fits in the budget; meshes already within it are returned as is
+    """
+    vertices = np.asarray(vertices)
+    triangles = np.asarray(triangles)
+    if len(triangles) <= max_triangles:
+        return vertices, triangles
+
+    # bisect on the grid resolution; the face count grows with it
+    best = cluster_vertices(vertices, triangles, 1)
+    lo, hi = 1, 1024
+    while hi - lo > 1:
+        cells = (lo + hi) // 2
+        result = cluster_vertices(vertices, triangles, cells)
+        if len(result[1]) <= max_triangles:
+            lo, best = cells, result
+        else:
+            hi = cells
+
+    return best
+
+
+def sample_faces(vertices, triangles, max_triangles, seed=0):
+    """
+    a rough preview in one pass, where decimate runs several clusterings:
+    a random subset of max_triangles faces, the same for every call
+
+    return:
+        returns the vertices used by the sampled faces and the faces
+    """
+    vertices = np.asarray(vertices)
+    triangles = np.asarray(triangles)
+    if len(triangles) <= max_triangles:
+        return vertices, triangles
+
+    faces = np.random.default_rng(seed).choice(len(triangles), max_triangles, replace=False)
+
+    return compact_vertices(vertices, triangles[np.sort(faces)])
+
+
+#---------------------------------------------------------------------------
+#                                Mesh-Edges
+#---------------------------------------------------------------------------
+
+def unique_edges(triangles):
+    """
+    params:
+        triangles is an int array of shape (no_triangles, 3)
+
+    return:
+        returns the unique edges as sorted vertex pairs (no_edges, 2), the
+        number of faces sharing each edge, and for each of the 3 * no_triangles
+        face edges the index of its unique edge
+    """
+    triangles = np.asarray(triangles, dtype=np.int64)
+    pairs = np.stack((triangles, np.roll(triangles, -1, axis=1)), axis=2).reshape(-1, 2)
+    pairs.sort(axis=1)
+
+    # one int64 key per pair is much faster to unique than rows
+    n = int(triangles.max()) + 1 if triangles.size else 1
+    keys, inverse, counts = np.unique(pairs[:, 0] * n + pairs[:, 1],
+                                      return_inverse=True, return_counts=True)
+    edges = np.stack((keys // n, keys % n), axis=1)
+
+    return edges, counts, inverse.ravel()
+
+
+def face_normals(vertices, triangles):
+    """
+    return:
+        returns the (not normalized) normal of every face; its length is
+        twice the face area
+    """
+    tri = vertices[triangles]
+
+    return np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+
+
+def boundary_edges(triangles):
+    """
+    return:
+        returns the edges used by one face only
+    """
+    edges, counts, _ = unique_edges(triangles)
+
+    return edges[counts == 1]
+
+
+def feature_edges(vertices, triangles, feature_angle=30.0):
+    """
+    return:
+        returns the edges where the two adjacent faces meet at more than
+        feature_angle degrees, plus boundary and non-manifold edges
+    """
+    edges, counts, inverse = unique_edges(triangles)
+
+    # group the face edges by unique edge: the faces around edge e are
+    # face_of[starts[e]:starts[e] + counts[e]]
+    order = np.argsort(inverse, kind='stable')
+    face_of = order // 3
+    starts = np.cumsum(counts) - counts
+
+    normals = face_normals(np.asarray(vertices, dtype=float), triangles)
+    length = np.linalg.norm(normals, axis=1)
+    normals /= np.where(length > 0, length, 1)[:, None]
+
+    manifold = np.flatnonzero(counts == 2)
+    cos_angle = np.einsum('ij,ij->i',
+                          normals[face_of[starts[manifold]]],
+                          normals[face_of[starts[manifold] + 1]])
+
+    sharp = counts != 2
+    sharp[manifold] = cos_angle < np.cos(np.radians(feature_angle))
+
+    return edges[sharp]
+
+
+def edge_lines(vertices, edges):
+    """
+    return:
+        returns the x, y, z coordinate arrays of the edges for a single
+        go.Scatter3d trace, each segment followed by a NaN gap
+    """
+    vertices = np.asarray(vertices, dtype=float)
+    lines = np.full((len(edges), 3, 3), np.nan)
+    lines[:, :2] = vertices[edges]
+    lines = lines.reshape(-1, 3)
+
+    return lines[:, 0], lines[:, 1], lines[:, 2]
+
+
+#---------------------------------------------------------------------------
+#                                Mesh-Cleanup
+#---------------------------------------------------------------------------
+
+def weld_vertices(vertices, triangles, tolerance):
+    """
+    merge the vertices that fall in the same cell of a grid with spacing
+    tolerance (a quantized-key np.unique); every cell keeps its first vertex
+
+    return:
+        returns vertices, triangles
+    """
+    keys = np.round(vertices / tolerance).astype(np.int64)
+    _, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+
+    return vertices[first], inverse.ravel()[triangles]
+
+
+def clean_mesh(vertices, triangles, tolerance=None):
+    """
+    params:
+        vertices is a float array of shape (no_points, 3)
+        triangles is an int array of shape (no_triangles, 3)
+        tolerance is the welding distance; by default 1e-6 of the bounding
+        box diagonal
+
+    return:
+        returns the welded vertices without unreferenced ones, and the
+        triangles without degenerate (repeated vertex or zero area) and
+        duplicate faces
+    """
+    vertices = np.asarray(vertices)
+    triangles = np.asarray(triangles)
+    if not len(triangles):
+        return vertices[:0], triangles
+
+    if tolerance is None:
+        diagonal = float(np.linalg.norm(vertices.max(axis=0) - vertices.min(axis=0)))
+        tolerance = 1e-6 * diagonal or 1e-12
+
+    vertices, triangles = weld_vertices(vertices, triangles, tolerance)
+    triangles = unique_faces(triangles)
+
+    area = np.linalg.norm(face_normals(vertices.astype(float), triangles), axis=1)
+    triangles = triangles[area > 0]
+
+    return compact_vertices(vertices, triangles)
+
+
+#---------------------------------------------------------------------------
+#                                Mesh-Clipping
+#---------------------------------------------------------------------------
+
+class PlaneSweep:
+    """
+    A mesh prepared for clipping by the planes of one direction.
+
+    The signed distance of every vertex along the plane normal and the
+    distance range of every face are computed once; the faces are sorted
+    by their farthest corner. Clipping at an offset is then a binary search
+    for the faces kept whole, and only the faces cut by the plane get new
+    geometry, so scrubbing the offset stays cheap on large meshes.
+    """
+
+    def __init__(self, vertices, triangles, normal):
+        normal = np.asarray(normal, dtype=float)
+        length = np.linalg.norm(normal)
+        if length == 0:
+            raise ValueError('the plane normal must not be zero')
+
+        self.vertices = np.asarray(vertices, dtype=float)
+        self.triangles = np.asarray(triangles)
+        self.normal = normal / length
+        self.distance = self.vertices @ self.normal
+
+        corner = self.distance[self.triangles]
+        self.face_min = corner.min(axis=1)
+        self.by_max = np.argsort(corner.max(axis=1), kind='stable')
+        self.sorted_max = corner.max(axis=1)[self.by_max]
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in
+                   (self.vertices, self.distance, self.face_min, self.by_max, self.sorted_max))
+
+    def offset(self, fraction):
+        """
+        return:
+            returns the plane offset at fraction (0 to 1) of the distance
+            range of the vertices
+        """
+        lo, hi = self.distance.min(), self.distance.max()
+
+        return float(lo + fraction * (hi - lo))
+
+    def clip(self, offset):
+        """
+        cut the mesh by the plane {p : p . normal = offset} and keep the
+        half behind it (distance <= offset)
+
+        return:
+            returns a dict with
+              vertices: the mesh vertices followed by the new vertices on
+                        the plane
+              triangles: the kept faces, whole ones first, then the pieces
+                         of the cut faces (orientation preserved)
+              faces: the index of the original face of every triangle
+              source: (u, v, t), every new vertex lies at t along the edge
+                      from vertex u to vertex v
+              section: the cross-section segments, pairs of new vertices
+        """
+        kept = self.by_max[:np.searchsorted(self.sorted_max, offset, side='right')]
+        rest = self.by_max[len(kept):]
+        cut = rest[self.face_min[rest] < offset]
+
+        # rotate every cut face so its lonely corner (alone on its side)
+        # comes first; a rotation keeps the orientation
+        d = self.distance[self.triangles[cut]] - offset
+        inside = d <= 0
+        one_in = inside.sum(axis=1) == 1
+        lonely = np.where(one_in, inside.argmax(axis=1), (~inside).argmax(axis=1))
+        corner = (lonely[:, None] + np.arange(3)) % 3
+        a, b, c = np.take_along_axis(self.triangles[cut], corner, axis=1).T
+
+        # one new vertex per crossing edge, shared by the faces around it
+        u = np.concatenate((np.minimum(a, b), np.minimum(a, c)))
+        v = np.concatenate((np.maximum(a, b), np.maximum(a, c)))
+        n = len(self.vertices)
+        _, first, inverse = np.unique(u.astype(np.int64) * n + v, return_index=True, return_inverse=True)
+        u, v = u[first], v[first]
+        t = (offset - self.distance[u]) / (self.distance[v] - self.distance[u])
+        points = self.vertices[u] + t[:, None] * (self.vertices[v] - self.vertices[u])
+
+        ab, ac = np.split(n + inverse.ravel(), 2)
+        two_in = ~one_in
+        triangles = np.concatenate((
+            self.triangles[kept],
+            np.column_stack((a, ab, ac))[one_in],
+            np.column_stack((b, c, ac))[two_in],
+            np.column_stack((b, ac, ab))[two_in]))
+        faces = np.concatenate((kept, cut[one_in], cut[two_in], cut[two_in]))
+
+        return dict(vertices=np.concatenate((self.vertices, points)),
+                    triangles=triangles.astype(self.triangles.dtype, copy=False),
+                    faces=faces,
+                    source=(u, v, t),
+                    section=np.column_stack((ab, ac)))
+
+
+def clip_values(values, location, clipped):
+    """
+    carry a per-face ('cell') or per-vertex field over to a clipped mesh;
+    the new vertices interpolate along their edge
+
+    return:
+        returns the field of the clipped mesh
+    """
+    values = np.asarray(values)
+    if location == 'cell':
+        return values[clipped['faces']]
+
+    u, v, t = clipped['source']
+
+    return np.concatenate((values, (1 - t) * values[u] + t * values[v]))
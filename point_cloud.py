@@ -0,0 +1,237 @@
+__author__ = "Hari Krishna Veerala"
+__credits__ = ["", ""]
+__license__ = ""
+__version__ = "1.0.1"
+__maintainer__ = ""
+__email__ = "veeralakrishna.com"
+__status__ = "Development" # Production/Development
+
+
+#---------------------------------------------------------------------------
+#                                imports
+#---------------------------------------------------------------------------
+
+import io
+import numpy as np
+
+from mesh_io import MeshFormatError, UPLOAD_LIMITS, check_limits
+
+# pandas (csv, excel; openpyxl and xlrd read .xlsx and .xls) and scipy
+# (delaunay) are imported by the functions that use them
+
+
+#---------------------------------------------------------------------------
+#                                Point-Tables
+#---------------------------------------------------------------------------
+
+# file types accepted by read_points
+POINT_FORMATS = ['.csv', '.xlsx', '.xls', '.npy']
+
+# csv files are parsed this many rows at a time
+CHUNK_ROWS = 2**18
+
+
+def point_columns(names):
+    """
+    return:
+        returns the x, y, z column names, matched case-insensitively, or
+        the first three columns when the table has no such header
+    """
+    lower = {str(name).strip().lower(): name for name in names}
+    if {'x', 'y', 'z'} <= lower.keys():
+        return [lower[c] for c in ('x', 'y', 'z')]
+    if len(names) < 3:
+        raise MeshFormatError('a point table needs x, y and z columns')
+
+    return list(names[:3])
+
+
+def _csv_points(file, limits):
+    """
+    read the x, y, z columns of a csv CHUNK_ROWS rows at a time, parsed
+    straight to float32; the header row is optional
+    """
+    import pandas as pd
+
+    # a first row of numbers is a point, not a header
+    first = pd.read_csv(file, header=None, nrows=1, dtype=str).iloc[0]
+    file.seek(0)
+    header = None if pd.to_numeric(first, errors='coerce').notna().all() else 0
+    columns = point_columns(first.index if header is None else list(first))
+
+    chunks = []
+    try:
+        for chunk in pd.read_csv(file, header=header, usecols=columns,
+                                 dtype={c: np.float32 for c in columns}, chunksize=CHUNK_ROWS):
+            chunks.append(chunk[columns].to_numpy(np.float32))
+            check_limits(limits, vertices=sum(map(len, chunks)))
+    except ValueError as e:
+        raise MeshFormatError(f'bad point table: {e}')
+
+    return np.concatenate(chunks) if chunks else np.zeros((0, 3), np.float32)
+
+
+def _excel_points(file):
+    """
+    read the x, y, z columns of the first sheet; an excel workbook cannot
+    be streamed, the sheet is read at once
+    """
+    import pandas as pd
+
+    sheet = pd.read_excel(file, sheet_name=0)
+    try:
+        return sheet[point_columns(sheet.columns)].to_numpy(np.float32)
+    except ValueError as e:
+        raise MeshFormatError(f'bad point table: {e}')
+
+
+def _npy_points(file):
+    """
+    read an (n, 3) array, or a structured array with x, y, z fields
+    """
+    try:
+        array = np.load(file, allow_pickle=False)
+    except ValueError as e:
+        raise MeshFormatError(f'bad .npy file: {e}')
+
+    if array.dtype.names:
+        return np.column_stack([array[c] for c in point_columns(array.dtype.names)]).astype(np.float32)
+    if array.ndim != 2 or array.shape[1] < 3:
+        raise MeshFormatError(f'expected an array of shape (n, 3), got {array.shape}')
+
+    return array[:, :3].astype(np.float32)
+
+
+def read_points(file, file_type, limits=UPLOAD_LIMITS):
+    """
+    params:
+        file is a binary file object, e.g. a streamlit UploadedFile
+        file_type is one of POINT_FORMATS
+        limits is a dict like mesh_io.UPLOAD_LIMITS, the points count as
+        vertices
+
+    return:
+        returns the points as float32 (no_points, 3); rows with missing
+        or infinite values are dropped
+    """
+    file.seek(0, io.SEEK_END)
+    check_limits(limits, n_bytes=file.tell())
+    file.seek(0)
+
+    if file_type == '.csv':
+        points = _csv_points(file, limits)
+    elif file_type in ('.xlsx', '.xls'):
+        points = _excel_points(file)
+    elif file_type == '.npy':
+        points = _npy_points(file)
+    else:
+        raise MeshFormatError(f'unsupported file type {file_type!r}')
+
+    check_limits(limits, vertices=len(points))
+    points = points[np.isfinite(points).all(axis=1)]
+    if len(points) < 3:
+        raise MeshFormatError('a surface needs at least 3 points')
+
+    return points
+
+
+#---------------------------------------------------------------------------
+#                                Surface-Triangulation
+#---------------------------------------------------------------------------
+
+# triangulations offered for point tables, see triangulate_points
+TRIANGULATION_METHODS = ['auto', 'grid', 'delaunay']
+
+# a lattice is accepted when at least this part of its nodes hold a point
+GRID_MIN_FILL = 0.5
+
+
+def grid_triangulate(points):
+    """
+    triangulate points lying on a rectilinear xy lattice (a raster, a
+    meshgrid export): every lattice cell whose four corners hold a point
+    is split into two triangles, missing points leave holes
+
+    return:
+        returns the triangles as int32 (no_triangles, 3); raises
+        ValueError when the points are not on a lattice
+    """
+    xs, ix = np.unique(points[:, 0], return_inverse=True)
+    ys, iy = np.unique(points[:, 1], return_inverse=True)
+    nx, ny = len(xs), len(ys)
+    if nx < 2 or ny < 2 or nx * ny * GRID_MIN_FILL > len(points):
+        raise ValueError(f'the points are not on a grid ({nx} x {ny} lattice for {len(points)} points)')
+
+    # the point at every lattice node, -1 where there is none; int32
+    # throughout, the tables of millions of points stay small
+    node = np.full(nx * ny, -1, dtype=np.int32)
+    node[iy.ravel() * nx + ix.ravel()] = np.arange(len(points), dtype=np.int32)
+    node = node.reshape(ny, nx)
+
+    a, b, c, d = node[:-1, :-1], node[:-1, 1:], node[1:, 1:], node[1:, :-1]
+    full = (a >= 0) & (b >= 0) & (c >= 0) & (d >= 0)
+    n_cells = int(full.sum())
+
+    triangles = np.empty((2 * n_cells, 3), dtype=np.int32)
+    for column, (first, second) in enumerate(((a, a), (b, c), (c, d))):
+        triangles[:n_cells, column] = first[full]
+        triangles[n_cells:, column] = second[full]
+
+    return triangles
+
+
+def delaunay_triangulate(points, max_edge=None):
+    """
+    2.5D delaunay triangulation: triangulate the xy projection of the
+    points, z is carried along as the height; needs scipy
+
+    params:
+        max_edge drops the triangles with an xy edge longer than it, e.g.
+        the slivers spanning the concave parts of the convex hull
+
+    return:
+        returns the triangles as int32 (no_triangles, 3); raises
+        MeshFormatError when the xy projection is degenerate
+    """
+    try:
+        from scipy.spatial import Delaunay, QhullError
+    except ImportError:
+        raise ImportError('the delaunay triangulation needs scipy (pip install scipy)')
+
+    xy = np.asarray(points[:, :2], dtype=float)
+    try:
+        triangles = Delaunay(xy).simplices.astype(np.int32)
+    except QhullError as e:
+        # e.g. collinear points, or all of them at one xy position
+        raise MeshFormatError(f'cannot triangulate the points, their xy projection is degenerate: '
+                              f'{str(e).splitlines()[0]}')
+
+    if max_edge is not None:
+        corners = xy[triangles]
+        lengths = np.linalg.norm(corners - corners[:, [1, 2, 0]], axis=2)
+        triangles = triangles[lengths.max(axis=1) <= max_edge]
+
+    return triangles
+
+
+def triangulate_points(points, method='auto', max_edge=None):
+    """
+    params:
+        points is a float array of shape (no_points, 3)
+        method is one of TRIANGULATION_METHODS; 'auto' takes the grid
+        triangulation when the points are on a lattice, delaunay otherwise
+
+    return:
+        returns the triangles as int32 (no_triangles, 3) and the method used
+    """
+    if method not in TRIANGULATION_METHODS:
+        raise ValueError(f'unknown triangulation method {method!r}')
+
+    if method in ('auto', 'grid'):
+        try:
+            return grid_triangulate(points), 'grid'
+        except ValueError:
+            if method == 'grid':
+                raise
+
+    return delaunay_triangulate(points, max_edge), 'delaunay'
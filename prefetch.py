@@ -0,0 +1,151 @@
+__author__ = "Hari Krishna Veerala"
+__credits__ = ["", ""]
+__license__ = ""
+__version__ = "1.0.1"
+__maintainer__ = ""
+__email__ = "veeralakrishna.com"
+__status__ = "Development" # Production/Development
+
+
+#---------------------------------------------------------------------------
+#                                imports
+#---------------------------------------------------------------------------
+
+import threading
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import warm_model
+from mesh_cache import mesh_cache
+
+
+#---------------------------------------------------------------------------
+#                                Background prefetch
+#---------------------------------------------------------------------------
+
+# one small pool for every session: prefetching must stay in the background
+_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="prefetch")
+
+# how often every model was shown, across sessions
+view_counts = Counter()
+_view_lock = threading.Lock()
+
+
+class Prefetcher:
+    """
+    Per-session prefetcher. After a model is shown, its neighbours in the
+    select box list (and optionally the most viewed models) are warmed up
+    into mesh_cache on the background pool, as cold entries (see
+    MeshCache.background). A new selection cancels the jobs of the previous
+    one: queued jobs are dropped, running jobs stop at their next stage.
+    """
+
+    def __init__(self, radius=1, most_viewed=0):
+        self.radius = radius
+        self.most_viewed = most_viewed
+        self.generation = 0
+        self.futures = []
+
+    def cancel(self):
+        self.generation += 1
+        for future in self.futures:
+            future.cancel()
+        self.futures = []
+
+    def candidates(self, current, models):
+        """
+        return:
+            returns the models to prefetch, nearest neighbours first
+        """
+        index = models.index(current)
+        picks = []
+        for offset in range(1, self.radius + 1):
+            for neighbour in (index + offset, index - offset):
+                if 0 <= neighbour < len(models) and models[neighbour] is not None:
+                    picks.append(models[neighbour])
+
+        if self.most_viewed:
+            with _view_lock:
+                picks += [model for model, _ in view_counts.most_common(self.most_viewed + 1)]
+
+        seen = {current}
+        return [model for model in picks if not (model in seen or seen.add(model))]
+
+    def after_view(self, current, models, **options):
+        """
+        record the view of current ((file_name, data_type)) and prefetch
+        around it with the same stage options (see utils.warm_model);
+        returns immediately
+        """
+        with _view_lock:
+            view_counts[current] += 1
+
+        self.cancel()
+        generation = self.generation
+
+        def cancelled():
+            return self.generation != generation
+
+        def job(file_name, data_type):
+            # prefetched entries go in at the cold end of the cache and are
+            # evicted before anything a session has looked at
+            with mesh_cache.background():
+                if not cancelled():
+                    warm_model(file_name, data_type, cancelled=cancelled, **options)
+
+        self.futures = [_pool.submit(job, *model) for model in self.candidates(current, models)]
+
+
+class Refiner:
+    """
+    Per-session background refinement for progressive rendering (see
+    utils.progressive_stage). The finer levels of detail of the model on
+    screen are warmed up into mesh_cache one after the other, so the script
+    can show each as soon as its future completes. A new request cancels
+    the stale one the same way as Prefetcher.
+
+    Every refiner has its own single worker: the script waits on the
+    levels, so they must not queue behind prefetch jobs or the refinements
+    of other sessions. The idle worker exits with the session.
+    """
+
+    def __init__(self):
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="refine")
+        self.generation = 0
+        self.futures = []
+        self.request = None
+        # the last request shown in full
+        self.done = None
+
+    def cancel(self):
+        self.generation += 1
+        for future in self.futures:
+            future.cancel()
+        self.futures = []
+
+    def refine(self, file_name, data_type, levels, request, **options):
+        """
+        warm up the levels (triangle budgets, see utils.warm_model) of one
+        model in order; returns immediately
+
+        return:
+            returns the future of every level, True once it is warm
+        """
+        self.cancel()
+        self.request = request
+        generation = self.generation
+
+        def cancelled():
+            return self.generation != generation
+
+        def job(level):
+            return not cancelled() and warm_model(file_name, data_type, max_triangles=level,
+                                                  cancelled=cancelled, **options)
+
+        self.futures = [self._pool.submit(job, level) for level in levels]
+
+        return self.futures
+
+    def finish(self):
+        self.done = self.request
@@ -0,0 +1,128 @@
+__author__ = "Hari Krishna Veerala"
+__credits__ = ["", ""]
+__license__ = ""
+__version__ = "1.0.1"
+__maintainer__ = ""
+__email__ = "veeralakrishna.com"
+__status__ = "Development" # Production/Development
+
+
+#---------------------------------------------------------------------------
+#                                imports
+#---------------------------------------------------------------------------
+
+import os
+import time
+import argparse
+
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from utils import mesh_path, surface_figure, write_html, write_plotlyjs, edge_modes
+from catalog import DATA_DIRS
+
+
+#---------------------------------------------------------------------------
+#                                Batch HTML renderer
+#---------------------------------------------------------------------------
+
+def find_models(names=None):
+    """
+    params:
+        names are model names (file names without extension) in DATA_DIRS;
+        None selects every model
+
+    return:
+        returns the sorted list of (name, data_type) pairs
+    """
+    models = []
+    for data_type, data_dir in DATA_DIRS.items():
+        for file_name in os.listdir(data_dir):
+            name = file_name[:-len(data_type)]
+            if file_name.endswith(data_type) and (names is None or name in names):
+                models.append((name, data_type))
+
+    missing = set(names or ()) - {name for name, _ in models}
+    if missing:
+        raise ValueError(f"unknown models: {', '.join(sorted(missing))}")
+
+    return sorted(models)
+
+
+def render_model(name, data_type, out_dir, **options):
+    """
+    render one model to {out_dir}/{name}.html; runs in a worker process
+
+    return:
+        returns (name, triangles, seconds, bytes written)
+    """
+    start = time.perf_counter()
+    _, fig, _ = surface_figure(name, data_type, **options)
+    nbytes = write_html(fig, Path(out_dir) / f"{name}.html")
+
+    return name, len(fig.data[0].i), time.perf_counter() - start, nbytes
+
+
+def render_batch(models, out_dir="Output", workers=None, force=False, **options):
+    """
+    render the models to html across a process pool; models whose html is
+    newer than their source file are skipped unless force is set
+    """
+    todo = []
+    for name, data_type in models:
+        html_path = Path(out_dir) / f"{name}.html"
+        if force or not html_path.exists() or \
+                html_path.stat().st_mtime < os.stat(mesh_path(name, data_type)).st_mtime:
+            todo.append((name, data_type))
+
+    print(f"{len(todo)} of {len(models)} models to render, {len(models) - len(todo)} up to date")
+    if not todo:
+        return
+
+    # the shared bundle is written once here, not raced by the workers
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    write_plotlyjs(out_dir)
+
+    start = time.perf_counter()
+    total_triangles = total_bytes = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(render_model, name, data_type, out_dir, **options)
+                   for name, data_type in todo]
+        for future in as_completed(futures):
+            name, triangles, seconds, nbytes = future.result()
+            total_triangles += triangles
+            total_bytes += nbytes
+            print(f"{name}: {triangles:,} triangles in {seconds:.2f}s, "
+                  f"{nbytes / 2**20:.1f} MB, {triangles / seconds:,.0f} triangles/s")
+
+    elapsed = time.perf_counter() - start
+    print(f"rendered {len(todo)} models in {elapsed:.2f}s: "
+          f"{len(todo) / elapsed:.1f} models/s, {total_triangles / elapsed:,.0f} triangles/s, "
+          f"{total_bytes / 2**20:.1f} MB written")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Render sample models to standalone html files")
+    parser.add_argument("models", nargs="*", help="model names, e.g. big_dodge 019-SUV")
+    parser.add_argument("--all", action="store_true", help="render every model in data/")
+    parser.add_argument("--out", default="Output", help="output directory")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: cpu count)")
+    parser.add_argument("--force", action="store_true", help="render models whose html is up to date too")
+    parser.add_argument("--color-mode", default="facecolor", choices=["facecolor", "intensity"])
+    parser.add_argument("--max-triangles", type=int, default=None, help="triangle budget")
+    parser.add_argument("--edges", default=None, choices=edge_modes[1:])
+    parser.add_argument("--no-axis", action="store_true")
+    args = parser.parse_args()
+
+    if not args.models and not args.all:
+        parser.error("give model names or --all")
+
+    render_batch(find_models(None if args.all else args.models),
+                 out_dir=args.out,
+                 workers=args.workers,
+                 force=args.force,
+                 axis=not args.no_axis,
+                 color_mode=args.color_mode,
+                 max_triangles=args.max_triangles,
+                 plot_edges=args.edges)
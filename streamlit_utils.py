@@ -8,16 +8,15 @@ __status__ = "Development" # Production/Development
 
 
 # import packages
-import base64
 import json
-import pickle
 import uuid
 import re
 
 
 import streamlit as st
-import pandas as pd
-import numpy as np
+
+# pandas, pickle and base64 are imported by the functions that use them, so
+# importing this module does not load them
 
 
 
@@ -41,12 +40,13 @@ def hide_header_footer():
 
 
 # Load dataset
-@st.cache(allow_output_mutation=True)
+@st.cache_resource
 def load_data(data_file):
     """
     load_data reads csv files
 
-    Used st.cache decorator to cache data
+    Used st.cache_resource decorator to cache data: the dataframe is shared
+    between reruns and sessions without being copied
 
     Parameters:
     ************************
@@ -58,23 +58,24 @@ def load_data(data_file):
     df:
         Pandas dataframe
     """
+    import pandas as pd
+
     # Read csv using pandas
-    data = pd.read_csv(data_file)
-    # Copy dataframe
-    df = data.copy()
+    df = pd.read_csv(data_file)
     # return dataframe
     return df
 
 
-@st.cache(allow_output_mutation=True)
+@st.cache_resource
 def load_excel(data_file):
     """
     load_excel reads the excel file
 
-    *Note: st.cache decorator is used
+    *Note: st.cache_resource decorator is used
     Streamlit provides a caching mechanism that allows your app to stay performant
     even when loading data from the web, manipulating large datasets, or performing
-    expensive computations. This is done with the @st.cache decorator.*
+    expensive computations. st.cache_resource returns the cached object itself,
+    so the dataframes are shared instead of copied on every rerun.*
 
     Parameters:
     ************************
@@ -89,17 +90,17 @@ def load_excel(data_file):
     sheet_names:
                 list of sheet names in excel file
     """
+    import pandas as pd
+
     # read excel using pandas
-    exls = pd.read_excel(data_file, sheet_name=None)
-    # make a copy of df
-    xls = exls.copy()
+    xls = pd.read_excel(data_file, sheet_name=None)
     # extract sheet names to a list
     sheet_names = list(xls.keys())
     # return datframe & sheet names
     return xls, sheet_names
 
 
-@st.cache
+@st.cache_data
 def returnCatNumList(df):
     """
     Function to get numeric columns and object columns from dataframe
@@ -120,9 +121,9 @@ def returnCatNumList(df):
     """
 
     # Get object columns
-    object_cols = list(df.select_dtypes(exclude=np.number).columns)
+    object_cols = list(df.select_dtypes(exclude='number').columns)
     # Get numeric columns
-    numeric_cols = list(df.select_dtypes(include=np.number).columns)
+    numeric_cols = list(df.select_dtypes(include='number').columns)
 
     # return object & numeric column
     return object_cols, numeric_cols
@@ -176,7 +177,11 @@ def download_button(object_to_download, download_filename, button_text, pickle_i
     download_link(your_df, 'YOUR_DF.csv', 'Click to download data!')
     download_link(your_str, 'YOUR_STRING.txt', 'Click to download text!')
     """
+    import base64
+
     if pickle_it:
+        import pickle
+
         try:
             object_to_download = pickle.dumps(object_to_download)
         except pickle.PicklingError as e:
@@ -187,7 +192,7 @@ def download_button(object_to_download, download_filename, button_text, pickle_i
         if isinstance(object_to_download, bytes):
             pass
 
-        elif isinstance(object_to_download, pd.DataFrame):
+        elif hasattr(object_to_download, 'to_csv'):  # a pandas DataFrame
             object_to_download = object_to_download.to_csv(index=False)
 
         # Try JSON encode for everything else
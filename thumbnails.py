@@ -0,0 +1,279 @@
+__author__ = "Hari Krishna Veerala"
+__credits__ = ["", ""]
+__license__ = ""
+__version__ = "1.0.1"
+__maintainer__ = ""
+__email__ = "veeralakrishna.com"
+__status__ = "Development" # Production/Development
+
+
+#---------------------------------------------------------------------------
+#                                imports
+#---------------------------------------------------------------------------
+
+import os
+import time
+import zlib
+import struct
+import argparse
+import threading
+import multiprocessing
+import numpy as np
+
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from colormaps import RdBu
+from utils import CACHE_DIR, load_mesh
+from mesh_ops import face_normals
+
+
+#---------------------------------------------------------------------------
+#                                Software-Rasterizer
+#---------------------------------------------------------------------------
+
+THUMBNAIL_DIR = os.path.join(CACHE_DIR, "thumbnails")
+
+# (width, height) of the gallery thumbnails
+THUMBNAIL_SIZE = (192, 144)
+
+# part of the cache key; bump it when the rendering changes
+THUMBNAIL_VERSION = 1
+
+# candidate (triangle, pixel) pairs tested at once
+BATCH_PIXELS = 2**20
+
+
+def view_basis(eye=(1.25, 1.25, 1.25), up=(0, 0, 1)):
+    """
+    return:
+        returns the right, up and forward unit vectors of a camera looking
+        from eye towards the origin, the default camera of the viewer
+    """
+    forward = -np.asarray(eye, dtype=float)
+    forward /= np.linalg.norm(forward)
+    right = np.cross(forward, up)
+    right /= np.linalg.norm(right)
+
+    return right, np.cross(right, forward), forward
+
+
+def pixel_candidates(corners, width, height):
+    """
+    params:
+        corners is a float array of shape (no_triangles, 3, 2) in pixels
+
+    return:
+        returns the pixel bounding box of every triangle, (x0, y0) and its
+        width and height in pixels; empty off-screen boxes are 0 wide
+    """
+    lo = np.ceil(corners.min(axis=1) - 0.5).astype(np.int64)
+    hi = np.floor(corners.max(axis=1) - 0.5).astype(np.int64)
+    lo = np.maximum(lo, 0)
+    hi = np.minimum(hi, [width - 1, height - 1])
+
+    return lo, np.maximum(hi - lo + 1, 0)
+
+
+def rasterize(vertices, triangles, size=THUMBNAIL_SIZE, colormap=RdBu, margin=0.05):
+    """
+    render a mesh headless with numpy: orthographic view from the default
+    camera, z-buffered, flat shaded and colored by face height like the
+    interactive view
+
+    params:
+        vertices is a float array of shape (no_vertices, 3)
+        triangles is an int array of shape (no_triangles, 3)
+        size is (width, height) in pixels
+
+    return:
+        returns an rgba uint8 image of shape (height, width, 4); the
+        background is transparent
+    """
+    width, height = size
+    vertices = np.asarray(vertices, dtype=float)
+    triangles = np.asarray(triangles)
+    right, up, forward = view_basis()
+
+    # screen coordinates, fitted to the image with the same scale on both axes
+    screen = np.column_stack((vertices @ right, vertices @ up))
+    depth = vertices @ forward
+    lo, hi = screen.min(axis=0), screen.max(axis=0)
+    scale = (1 - 2 * margin) * min(width / max(hi[0] - lo[0], 1e-12),
+                                   height / max(hi[1] - lo[1], 1e-12))
+    center = (lo + hi) / 2
+    pixels = np.column_stack((width / 2 + (screen[:, 0] - center[0]) * scale,
+                              height / 2 - (screen[:, 1] - center[1]) * scale))
+
+    # one color per face: height colormap, two sided lambert shading
+    normals = face_normals(vertices, triangles)
+    length = np.linalg.norm(normals, axis=1)
+    light = -forward + 0.5 * up - 0.3 * right
+    light /= np.linalg.norm(light)
+    shade = 0.35 + 0.65 * np.abs(normals @ light) / np.where(length > 0, length, 1)
+    zmean = vertices[triangles, 2].mean(axis=1)
+    span = zmean.max() - zmean.min()
+    face_rgb = colormap((zmean - zmean.min()) / span if span > 0 else np.full(len(zmean), 0.5))[:, :3]
+    face_rgb = face_rgb * shade[:, None]
+
+    corners = pixels[triangles]
+    corner_depth = depth[triangles]
+    x0, y0 = corners[:, 0, 0], corners[:, 0, 1]
+    x1, y1 = corners[:, 1, 0], corners[:, 1, 1]
+    x2, y2 = corners[:, 2, 0], corners[:, 2, 1]
+    area = (x1 - x0) * (y2 - y0) - (x2 - x0) * (y1 - y0)
+
+    box_lo, box_size = pixel_candidates(corners, width, height)
+    n_candidates = np.where(area != 0, box_size[:, 0] * box_size[:, 1], 0)
+
+    zbuffer = np.full(width * height, np.inf)
+    face = np.full(width * height, -1, dtype=np.int64)
+
+    # batches of whole triangles holding about BATCH_PIXELS candidates
+    drawn = np.flatnonzero(n_candidates)
+    total = np.cumsum(n_candidates[drawn])
+    splits = np.searchsorted(total, np.arange(BATCH_PIXELS, total[-1], BATCH_PIXELS)) if len(drawn) else []
+    for batch in np.split(drawn, splits):
+        if not len(batch):
+            continue
+        counts = n_candidates[batch]
+        tri = np.repeat(batch, counts)
+        # position of every candidate inside the box of its triangle
+        k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        px = box_lo[tri, 0] + k % box_size[tri, 0]
+        py = box_lo[tri, 1] + k // box_size[tri, 0]
+        cx, cy = px + 0.5, py + 0.5
+
+        # barycentric weights of the pixel centers
+        w0 = ((x1[tri] - cx) * (y2[tri] - cy) - (x2[tri] - cx) * (y1[tri] - cy)) / area[tri]
+        w1 = ((x2[tri] - cx) * (y0[tri] - cy) - (x0[tri] - cx) * (y2[tri] - cy)) / area[tri]
+        w2 = 1 - w0 - w1
+        inside = (w0 >= 0) & (w1 >= 0) & (w2 >= 0)
+
+        tri, pixel = tri[inside], (py * width + px)[inside]
+        z = (w0[inside] * corner_depth[tri, 0] + w1[inside] * corner_depth[tri, 1] +
+             w2[inside] * corner_depth[tri, 2])
+
+        # the nearest candidate of every pixel, then the depth test
+        order = np.lexsort((z, pixel))
+        first = order[np.unique(pixel[order], return_index=True)[1]]
+        closer = first[z[first] < zbuffer[pixel[first]]]
+        zbuffer[pixel[closer]] = z[closer]
+        face[pixel[closer]] = tri[closer]
+
+    image = np.zeros((width * height, 4), dtype=np.uint8)
+    covered = face >= 0
+    image[covered, :3] = np.round(face_rgb[face[covered]] * 255)
+    image[covered, 3] = 255
+
+    return image.reshape(height, width, 4)
+
+
+def png_bytes(image):
+    """
+    params:
+        image is an rgb or rgba uint8 array of shape (height, width, 3 or 4)
+
+    return:
+        returns the image encoded as png, with zlib only
+    """
+    height, width, channels = image.shape
+    # every row starts with filter type 0 (none)
+    raw = np.zeros((height, 1 + width * channels), dtype=np.uint8)
+    raw[:, 1:] = image.reshape(height, -1)
+
+    def chunk(tag, data):
+        return (struct.pack(">I", len(data)) + tag + data +
+                struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff))
+
+    color_type = {3: 2, 4: 6}[channels]
+    return (b"\x89PNG\r\n\x1a\n" +
+            chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)) +
+            chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)) +
+            chunk(b"IEND", b""))
+
+
+#---------------------------------------------------------------------------
+#                                Thumbnail-Cache
+#---------------------------------------------------------------------------
+
+def thumbnail_path(sha256, size=THUMBNAIL_SIZE, thumbnail_dir=THUMBNAIL_DIR):
+    """
+    return:
+        returns the cache path of a thumbnail, keyed on the content hash of
+        the model file, so renamed or touched files keep their thumbnail
+    """
+    width, height = size
+
+    return Path(thumbnail_dir) / f"{sha256}-{width}x{height}-v{THUMBNAIL_VERSION}.png"
+
+
+def render_thumbnail(file_path, data_type, png_path, size=THUMBNAIL_SIZE):
+    """
+    render one model to png_path; runs in a worker process
+
+    return:
+        returns (file_path, triangles, seconds)
+    """
+    start = time.perf_counter()
+    x, y, z, triangles, _ = load_mesh(file_path, data_type)
+    image = rasterize(np.column_stack((x, y, z)), triangles, size)
+
+    # written under a temporary name, a reader never sees half a file
+    tmp_path = f"{png_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(png_bytes(image))
+    os.replace(tmp_path, png_path)
+
+    return file_path, len(triangles), time.perf_counter() - start
+
+
+def build_thumbnails(catalog, size=THUMBNAIL_SIZE, thumbnail_dir=THUMBNAIL_DIR,
+                     workers=None, progress=None):
+    """
+    render the missing thumbnails of the catalog entries across a process
+    pool
+
+    params:
+        catalog is a dict from file path to catalog entry, see catalog.py
+        progress is called with (done, todo) after every rendered model
+
+    return:
+        returns a dict from file path to thumbnail path
+    """
+    paths = {file_path: thumbnail_path(entry['sha256'], size, thumbnail_dir)
+             for file_path, entry in catalog.items()}
+    todo = [file_path for file_path, png_path in paths.items() if not png_path.exists()]
+    if not todo:
+        return paths
+
+    Path(thumbnail_dir).mkdir(parents=True, exist_ok=True)
+    # spawned, not forked: the app calls this from a script thread, and a
+    # fork of a threaded process can deadlock on a lock held by another thread
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(render_thumbnail, file_path, catalog[file_path]['format'],
+                               paths[file_path], size)
+                   for file_path in todo]
+        for done, future in enumerate(as_completed(futures), 1):
+            future.result()
+            if progress is not None:
+                progress(done, len(todo))
+
+    return paths
+
+
+if __name__ == "__main__":
+
+    from catalog import refresh_catalog
+
+    parser = argparse.ArgumentParser(description="Render the gallery thumbnails of every model in data/")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: cpu count)")
+    parser.add_argument("--width", type=int, default=THUMBNAIL_SIZE[0])
+    parser.add_argument("--height", type=int, default=THUMBNAIL_SIZE[1])
+    args = parser.parse_args()
+
+    catalog = refresh_catalog()
+    start = time.perf_counter()
+    build_thumbnails(catalog, (args.width, args.height), workers=args.workers,
+                     progress=lambda done, todo: print(f"\r{done}/{todo}", end="", flush=True))
+    print(f"\n{len(catalog)} thumbnails up to date in {time.perf_counter() - start:.2f}s")
@@ -16,18 +16,29 @@ VERSION = "0.2.2"
 
 import os
 import json
+import time
+import hashlib
+import threading
 import numpy as np
-import matplotlib.cm as cm
-
-import plotly.graph_objs as go
-
 
 from pathlib import Path
-from functools import reduce
-from operator import itemgetter
-from plyfile import PlyData, PlyElement
+from concurrent.futures import ThreadPoolExecutor
 
-import streamlit as st
+# plotly, plyfile and streamlit are imported by the functions that use them,
+# so importing utils (catalog, batch tools, a cold app start) stays cheap;
+# colors come from the baked colormaps instead of matplotlib
+from colormaps import RdBu
+from mesh_cache import mesh_cache, file_key
+from instrument import span, active
+from mesh_ops import (decimate, sample_faces, clean_mesh, unique_edges, boundary_edges, feature_edges,
+                      edge_lines, PlaneSweep, clip_values)
+from mesh_fields import SCALAR_FIELDS, scalar_field, field_range, face_areas
+from mesh_index import PointTree, faces_of
+from point_cloud import read_points, triangulate_points
+from mesh_io import file_buffer, check_limits, read_ply, read_mesh, export_mesh, UPLOAD_LIMITS
+
+# binary cache of the parsed car-model json files, see load_json_model
+CACHE_DIR = "data/cache"
 
 #---------------------------------------------------------------------------
 #                                Viz-Utils
@@ -39,47 +50,181 @@ def tri_indices(simplices):
         simplices is a numpy array defining the simplices of the triangularization
         
     return:
-        returns the lists of indices i, j, k
+        returns the arrays of indices i, j, k
     """
-    
-    return ([triplet[c] for triplet in simplices] for c in range(3))
+    simplices = np.asarray(simplices)
 
-def plotly_trisurf(x, y, z, simplices, colormap=cm.RdBu, plot_edges=None):
+    return (simplices[:, c] for c in range(3))
+
+
+def face_zmean(points3D, simplices):
     """
-    x, y, z are lists of coordinates of the triangle vertices 
-    simplices are the simplices that define the triangularization;
-    simplices  is a numpy array of shape (no_triangles, 3)
+    params:
+        points3D is a numpy array of shape (no_points, 3)
+        simplices is a numpy array of shape (no_triangles, 3)
+
+    return:
+        returns the mean z coordinate of every face, computed with one gather
+    """
+
+    return points3D[:, 2][simplices].mean(axis=1)
+
+
+_colormap_luts = {}
+
+def colormap_lut(colormap):
+    """
+    params:
+        colormap is a matplotlib or baked colormap (see colormaps)
+
+    return:
+        returns a (colormap.N, 3) uint8 array with the rgb value of every
+        colormap entry, rounded the same way as map_z2color
+    """
+    key = (colormap.name, colormap.N)
+    if key not in _colormap_luts:
+        rgba = colormap(np.arange(colormap.N))
+        _colormap_luts[key] = (rgba[:, :3]*255 + 0.5).astype(np.uint8)
+
+    return _colormap_luts[key]
+
+
+def colormap_colorscale(colormap):
+    """
+    params:
+        colormap is a matplotlib or baked colormap (see colormaps)
+
+    return:
+        returns a stepped plotly colorscale with one flat band per colormap
+        entry, so intensity coloring picks the same colors as map_z2colors
     """
+    lut = colormap_lut(colormap)
+    n = len(lut)
+    colorscale = []
+    for c, (R, G, B) in enumerate(lut.tolist()):
+        color = f'rgb({R},{G},{B})'
+        colorscale.append([c/n, color])
+        colorscale.append([(c+1)/n, color])
+
+    return colorscale
+
+
+def face_colors(x, y, z, simplices, colormap=RdBu, color_mode='facecolor'):
+    """
+    x, y, z are lists of coordinates of the triangle vertices
+    simplices is a numpy array of shape (no_triangles, 3)
+    color_mode is 'facecolor' to build one rgb string per face, or 'intensity'
+    to keep the face z-means with a colorscale and let plotly color them
+
+    return:
+        returns the go.Mesh3d color arguments as a dict
+    """
+    if color_mode not in ('facecolor', 'intensity'):
+        raise ValueError(f'unknown color_mode {color_mode!r}')
 
     points3D=np.vstack((x,y,z)).T
-    tri_vertices=map(lambda index: points3D[index], simplices)
-    zmean=[np.mean(tri[:,2]) for tri in tri_vertices ]
+    zmean=face_zmean(points3D, np.asarray(simplices))
     min_zmean=np.min(zmean)
     max_zmean=np.max(zmean)
-    facecolor=[map_z2color(zz,  
-                           colormap, 
-                           min_zmean, 
-                           max_zmean) for zz in zmean]
+
+    if color_mode == 'facecolor':
+        return dict(facecolor=map_z2colors(zmean,
+                                           colormap,
+                                           min_zmean,
+                                           max_zmean))
+
+    return dict(intensity=zmean,
+                intensitymode='cell',
+                colorscale=colormap_colorscale(colormap),
+                cmin=min_zmean,
+                cmax=max_zmean,
+                showscale=False)
+
+
+def field_colors(values, location, colormap=RdBu, title=None):
+    """
+    params:
+        values, location are a scalar field, see mesh_fields.scalar_field
+        title labels the colorbar
+
+    return:
+        returns the go.Mesh3d intensity arguments coloring the field over
+        its percentile range (see mesh_fields.field_range)
+    """
+    cmin, cmax = field_range(values)
+
+    return dict(intensity=np.nan_to_num(values, nan=cmin, posinf=cmax, neginf=cmin),
+                intensitymode=location,
+                colorscale=colormap_colorscale(colormap),
+                cmin=cmin,
+                cmax=cmax,
+                showscale=True,
+                colorbar=dict(title=title, thickness=15))
+
+
+def wireframe(x, y, z, simplices, plot_edges='all'):
+    """
+    x, y, z are lists of coordinates of the triangle vertices
+    simplices is a numpy array of shape (no_triangles, 3)
+    plot_edges is 'all' for every edge, 'feature' for the sharp edges or
+    'boundary' for the open edges; shared edges are drawn once
+
+    return:
+        returns the NaN-separated x, y, z line coordinates of the edges
+    """
+    points3D=np.vstack((x,y,z)).T
+    simplices = np.asarray(simplices)
+
+    if plot_edges in (True, 'all'):
+        edges = unique_edges(simplices)[0]
+    elif plot_edges == 'feature':
+        edges = feature_edges(points3D, simplices)
+    elif plot_edges == 'boundary':
+        edges = boundary_edges(simplices)
+    else:
+        raise ValueError(f'unknown plot_edges {plot_edges!r}')
+
+    return edge_lines(points3D, edges)
+
+
+def plotly_trisurf(x, y, z, simplices, colormap=RdBu, plot_edges=None,
+                   color_mode='facecolor', colors=None, edges=None):
+    """
+    x, y, z are lists of coordinates of the triangle vertices 
+    simplices are the simplices that define the triangularization;
+    simplices  is a numpy array of shape (no_triangles, 3)
+    color_mode is passed to face_colors and plot_edges to wireframe; colors
+    and edges may hold their precomputed (e.g. cached) results instead
+    """
+    import plotly.graph_objs as go
+
+    simplices = np.asarray(simplices)
     I,J,K=tri_indices(simplices)
 
+    if colors is None:
+        colors = face_colors(x, y, z, simplices, colormap, color_mode)
+
     triangles=go.Mesh3d(x=x, 
                         y=y, 
                         z=z,
-                        facecolor=facecolor,
                         i=I, 
                         j=J, 
                         k=K,
-                        name='')
+                        name='',
+                        **colors)
 
     if plot_edges is None: return [triangles]
     else:
-        lists_coord=[[[T[k%3][c] for k in range(4)]+[ None]   for T in tri_vertices]  for c in range(3)]
-        Xe, Ye, Ze = [reduce(lambda x,y: x+y, lists_coord[k]) for k in range(3)]
+        if edges is None:
+            edges = wireframe(x, y, z, simplices, plot_edges)
+        Xe, Ye, Ze = edges
 
         lines=go.Scatter3d(x=Xe, 
                            y=Ye, 
                            z=Ze,
                            mode='lines',
+                           name='',
+                           hoverinfo='skip',
                            line=dict(color='rgb(50,50,50)', 
                                      width=1.5))
         return [triangles, lines]
@@ -97,8 +242,1231 @@ def map_z2color(zval, colormap, vmin, vmax):
     
     return 'rgb('+'{:d}'.format(int(R*255+0.5))+','+'{:d}'.format(int(G*255+0.5))+\
            ','+'{:d}'.format(int(B*255+0.5))+')'
+
+
+def map_z2colors(zvals, colormap, vmin, vmax):
+    """
+    vectorized map_z2color: map every value of the array zvals to its
+    'rgb(r,g,b)' string through the colormap lookup table
+
+    return:
+        returns a read-only object array of the strings, shared with the
+        lookup table; a clipped mesh takes its colors by fancy indexing,
+        see clip_colors
+    """
+    if vmin>vmax: 
+        raise ValueError('incorrect relation between vmin and vmax')
+
+    lut = colormap_lut(colormap)
+    n = len(lut)
+    # same binning as matplotlib Colormap.__call__ for floats in [0, 1]
+    if vmax > vmin:
+        t = (np.asarray(zvals, dtype=float)-vmin)/float((vmax-vmin))
+        index = np.clip(t*n, 0, n-1).astype(np.intp)
+    else:
+        index = np.zeros(np.shape(zvals), dtype=np.intp)
+
+    lut_str = np.array([f'rgb({R},{G},{B})' for R, G, B in lut.tolist()],
+                       dtype=object)
+
+    colors = lut_str[index]
+    colors.setflags(write=False)
+
+    return colors
            
-           
+
+
+#---------------------------------------------------------------------------
+#                                Mesh-Loaders
+#---------------------------------------------------------------------------
+
+def load_ply(file_path):
+    """
+    params:
+        file_path is the path of an ascii or binary .ply file
+
+    return:
+        returns x, y, z as contiguous arrays and the faces as an int array
+        of shape (no_triangles, 3); binary files with triangle faces (see
+        build_cache.py --ply) are memory-mapped, layouts the fast readers
+        do not handle fall back to plyfile, see mesh_io.read_ply
+    """
+    with span('parse', format='ply'), open(file_path, 'rb') as f:
+        vertices, triangles = read_ply(f, limits=None)
+
+    with span('extract'):
+        x, y, z = (np.ascontiguousarray(vertices[:, axis]) for axis in range(3))
+
+    return x, y, z, triangles
+
+
+def _json_cache_paths(file_path, cache_dir):
+    """
+    return:
+        returns the vertices, faces and metadata cache paths of a json model
+    """
+    base = Path(cache_dir) / "car_models_json"
+    stem = Path(file_path).stem
+
+    return (base / f"{stem}.vertices.npy",
+            base / f"{stem}.faces.npy",
+            base / f"{stem}.meta.json")
+
+
+def _save_atomic(path, write):
+    """
+    write a cache file under a temporary name and move it in place, so a
+    concurrent reader never sees a partially written file; the name is
+    unique per thread, sessions converting the same model do not collide
+    """
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def convert_json_model(file_path, cache_dir=CACHE_DIR):
+    """
+    parse a car-model json file once and write it to the binary cache:
+    float32 vertices, uint32 zero-based faces and a metadata file holding
+    car_type and the source mtime/size used for invalidation
+
+    return:
+        returns the metadata dict
+    """
+    stat = os.stat(file_path)
+    with open(file_path) as json_file:
+        data = json.load(json_file)
+
+    vertices, faces, car_type = json_arrays(data)
+    if len(faces) and faces.min() < 0:
+        raise ValueError(f"{file_path} - face indices must be 1-based")
+    faces = faces.astype(np.uint32)
+
+    meta = dict(car_type=car_type,
+                source_mtime_ns=stat.st_mtime_ns,
+                source_size=stat.st_size,
+                nr_vertices=len(vertices),
+                nr_faces=len(faces))
+
+    vertices_path, faces_path, meta_path = _json_cache_paths(file_path, cache_dir)
+    vertices_path.parent.mkdir(parents=True, exist_ok=True)
+    _save_atomic(vertices_path, lambda f: np.save(f, vertices))
+    _save_atomic(faces_path, lambda f: np.save(f, faces))
+    # metadata goes last: it is what marks the cache entry as complete
+    _save_atomic(meta_path, lambda f: f.write(json.dumps(meta).encode()))
+
+    return meta
+
+
+def _read_json_cache_meta(file_path, cache_dir):
+    """
+    return:
+        returns the cached metadata if the cache entry matches the current
+        source mtime and size, otherwise None
+    """
+    _, _, meta_path = _json_cache_paths(file_path, cache_dir)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    stat = os.stat(file_path)
+    if (meta.get('source_mtime_ns'), meta.get('source_size')) != \
+            (stat.st_mtime_ns, stat.st_size):
+        return None
+
+    return meta
+
+
+def load_json_model(file_path, cache_dir=CACHE_DIR):
+    """
+    params:
+        file_path is the path of a car-model json file
+        cache_dir is the root of the binary cache; None disables it
+
+    return:
+        returns vertices (no_points, 3), zero-based faces (no_triangles, 3)
+        and the car_type. With the cache, the arrays are read-only memory
+        maps shared by every process that opens the same model
+    """
+    if cache_dir is not None:
+        meta = _read_json_cache_meta(file_path, cache_dir)
+        try:
+            if meta is None:
+                meta = convert_json_model(file_path, cache_dir)
+            vertices_path, faces_path, _ = _json_cache_paths(file_path, cache_dir)
+            vertices = np.load(vertices_path, mmap_mode='r')
+            faces = np.load(faces_path, mmap_mode='r')
+            return vertices, faces, meta['car_type']
+        except OSError as e:
+            # read-only checkout or full disk: parse the json directly
+            print(f"{file_path} - binary cache unavailable ({e})")
+
+    with open(file_path) as json_file:
+        data = json.load(json_file)
+
+    return json_arrays(data)
+
+
+def json_arrays(data):
+    """
+    params:
+        data is a parsed car-model json file
+
+    return:
+        returns float32 vertices, zero-based int64 faces and the car_type
+    """
+
+    return (np.asarray(data['vertices'], dtype=np.float32),
+            np.asarray(data['faces'], dtype=np.int64) - 1,
+            data['car_type'])
+
+
+def mesh_path(file_name, data_type):
+    """
+    return:
+        returns the path of a sample model in the data directory
+    """
+    if data_type == ".json":
+        return f"data/car_models_json/{file_name}.json"
+
+    return f"data/ply_data/{file_name}.ply"
+
+
+def load_mesh(file_path, data_type):
+    """
+    params:
+        file_path is the path of a .json car model or a .ply file
+        data_type is ".json" or ".ply"
+
+    return:
+        returns x, y, z, triangles and the figure title; the arrays are
+        read-only since they are shared through mesh_cache
+    """
+    title = Path(file_path).stem
+
+    if data_type == ".json":
+        # parsed once into the binary cache, then memory-mapped
+        with span('parse', format='json'):
+            vertices, triangles, car_type = load_json_model(file_path)
+        # Unpack vertices
+        x, y, z = vertices[:,0], vertices[:,2], -vertices[:,1]
+
+        title = title +  " - " + car_type
+
+    else:
+        # req = urllib2.Request('https://people.sc.fsu.edu/~jburkardt/data/ply/skull.ply')
+        # opener = urllib2.build_opener()
+        # f = opener.open(req)
+        x, y, z, triangles = load_ply(file_path)
+
+    for array in (x, y, z, triangles):
+        array.setflags(write=False)
+
+    return x, y, z, triangles, title
+
+
+def mesh_stage(file_name, data_type):
+    """
+    pure mesh stage: load a sample model through mesh_cache
+
+    return:
+        returns the cache key of the mesh and (x, y, z, triangles, title)
+    """
+    file_path = mesh_path(file_name, data_type)
+    # keyed on the file mtime, so an edited file is loaded again
+    key = file_key(file_path) + ('mesh', data_type)
+    with span('mesh') as stage:
+        mesh = mesh_cache.get_or_compute(key, lambda: load_mesh(file_path, data_type))
+        stage.set(vertices=len(mesh[0]), triangles=len(mesh[3]))
+
+    return key, mesh
+
+
+def upload_stage(file_name, file, limits=UPLOAD_LIMITS):
+    """
+    pure mesh stage of an uploaded file: parse it through mesh_cache
+
+    params:
+        file_name is the name of the upload, its suffix selects the reader
+        file is a binary file object, e.g. a streamlit UploadedFile
+        limits bounds the size of the file and the mesh, see mesh_io
+
+    return:
+        returns the cache key of the mesh and (x, y, z, triangles, title);
+        raises mesh_io.MeshFormatError for a malformed or too large file
+    """
+    data_type = Path(file_name).suffix.lower()
+    buffer = file_buffer(file)
+    # checked before hashing, an oversized file is refused without reading it
+    check_limits(limits, n_bytes=memoryview(buffer).nbytes)
+    # keyed on the content, so a re-upload of the same file is a hit
+    with span('hash'):
+        key = ('upload', hashlib.sha256(buffer).hexdigest(), data_type)
+
+    def load():
+        with span('parse', format=data_type.lstrip('.')):
+            vertices, triangles = read_mesh(file, data_type, limits)
+        x, y, z = (np.ascontiguousarray(vertices[:, axis]) for axis in range(3))
+        for array in (x, y, z, triangles):
+            array.setflags(write=False)
+        return x, y, z, triangles, Path(file_name).stem
+
+    with span('mesh') as stage:
+        mesh = mesh_cache.get_or_compute(key, load)
+        stage.set(vertices=len(mesh[0]), triangles=len(mesh[3]))
+
+    return key, mesh
+
+
+def points_stage(file_name, file, method='auto', limits=UPLOAD_LIMITS):
+    """
+    mesh stage of an uploaded point table: read the x, y, z points and
+    triangulate them into a surface, through mesh_cache
+
+    params:
+        file_name is the name of the upload, its suffix selects the reader
+        method is a triangulation method, see point_cloud.triangulate_points
+
+    return:
+        returns the cache key of the mesh, its (x, y, z, triangles, title)
+        and a dict with the point and triangle counts, the method used and
+        the triangulation time
+    """
+    data_type = Path(file_name).suffix.lower()
+    buffer = file_buffer(file)
+    check_limits(limits, n_bytes=memoryview(buffer).nbytes)
+    with span('hash'):
+        key = ('points', hashlib.sha256(buffer).hexdigest(), data_type, method)
+
+    def load():
+        with span('parse', format=data_type.lstrip('.')):
+            points = read_points(file, data_type, limits)
+        start = time.perf_counter()
+        with span('triangulate', method=method):
+            triangles, used = triangulate_points(points, method)
+        info = dict(points=len(points), triangles=len(triangles), method=used,
+                    seconds=time.perf_counter() - start)
+
+        x, y, z = (np.ascontiguousarray(points[:, axis]) for axis in range(3))
+        for array in (x, y, z, triangles):
+            array.setflags(write=False)
+        return (x, y, z, triangles, Path(file_name).stem), info
+
+    with span('mesh') as stage:
+        mesh, info = mesh_cache.get_or_compute(key, load)
+        stage.set(vertices=len(mesh[0]), triangles=len(mesh[3]))
+
+    return key, mesh, info
+
+
+def clean_stage(mesh_key, mesh):
+    """
+    cleanup stage: weld duplicate vertices, drop degenerate and duplicate
+    faces and compact the vertex array (see mesh_ops.clean_mesh); the
+    result is cached next to the mesh
+
+    return:
+        returns the cache key of the cleaned mesh, its
+        (x, y, z, triangles, title) and a dict with the number of removed
+        vertices and faces and the time it took
+    """
+    key = mesh_key + ('clean',)
+
+    def build():
+        x, y, z, triangles, title = mesh
+        start = time.perf_counter()
+        vertices, cleaned = clean_mesh(np.column_stack((x, y, z)), triangles)
+        clean_time = time.perf_counter() - start
+
+        info = dict(removed_vertices=len(x) - len(vertices),
+                    removed_faces=len(triangles) - len(cleaned),
+                    clean_time=clean_time)
+
+        x, y, z = (np.ascontiguousarray(vertices[:, c]) for c in range(3))
+        for array in (x, y, z, cleaned):
+            array.setflags(write=False)
+
+        return (x, y, z, cleaned, title), info
+
+    with span('clean'):
+        clean_mesh_, info = mesh_cache.get_or_compute(key, build)
+
+    return key, clean_mesh_, info
+
+
+def field_stage(mesh_key, mesh, field):
+    """
+    scalar field stage: compute one field of mesh_fields.SCALAR_FIELDS
+    (normals, areas, curvature, ...); every field is cached next to the mesh
+
+    return:
+        returns the read-only field values and their location, 'cell' or
+        'vertex'
+    """
+    def build():
+        x, y, z, triangles, _ = mesh
+        values, location = scalar_field(field, np.column_stack((x, y, z)), triangles)
+        values.setflags(write=False)
+        return values, location
+
+    with span('field', field=field):
+        return mesh_cache.get_or_compute(mesh_key + ('field', field), build)
+
+
+def index_stage(mesh_key, mesh):
+    """
+    spatial index stage: a k-d tree over the vertices (see
+    mesh_index.PointTree), cached next to the mesh
+
+    return:
+        returns the PointTree
+    """
+    x, y, z, _, _ = mesh
+    with span('index'):
+        return mesh_cache.get_or_compute(mesh_key + ('index',),
+                                         lambda: PointTree(np.column_stack((x, y, z))))
+
+
+def selection_region(vertices, shape, center, size):
+    """
+    params:
+        shape is 'box' or 'sphere'
+        center is given as fractions (0 to 1) of the bounding box of the
+        vertices, size as a fraction of its diagonal: the half side of the
+        box or the radius of the sphere
+
+    return:
+        returns the region in model coordinates, (lo, hi) of the box or
+        (center, radius) of the sphere
+    """
+    lo, hi = vertices.min(axis=0), vertices.max(axis=0)
+    center = lo + np.asarray(center, dtype=float) * (hi - lo)
+    size = size * float(np.linalg.norm(hi - lo))
+
+    if shape == 'box':
+        return center - size, center + size
+    if shape == 'sphere':
+        return center, size
+
+    raise ValueError(f'unknown selection shape {shape!r}')
+
+
+def query_stage(mesh_key, mesh, selection=None, measure=None):
+    """
+    selection and measurement stage, answered from the spatial index
+
+    params:
+        selection is (shape, center, size), see selection_region; the
+        faces with all three vertices inside are selected
+        measure is a pair of points, each snapped to its nearest vertex
+
+    return:
+        returns the overlay traces and a dict with the results ('selection',
+        'measure') and the time of the queries
+    """
+    import plotly.graph_objs as go
+
+    x, y, z, triangles, _ = mesh
+    vertices = np.column_stack((x, y, z))
+    tree = index_stage(mesh_key, mesh)
+    traces, info = [], {}
+
+    if selection is not None:
+        shape, center, size = selection
+        with span('query', query=shape) as stage:
+            start = time.perf_counter()
+            region = selection_region(vertices, shape, center, size)
+            selected = tree.in_box(*region) if shape == 'box' else tree.in_sphere(*region)
+            faces = faces_of(triangles, selected, len(vertices))
+            info['selection'] = dict(vertices=len(selected),
+                                     faces=len(faces),
+                                     area=float(face_areas(vertices, triangles[faces]).sum()),
+                                     query_time=time.perf_counter() - start)
+            stage.set(vertices=len(selected))
+
+        traces.append(go.Scatter3d(x=x[selected],
+                                   y=y[selected],
+                                   z=z[selected],
+                                   mode='markers',
+                                   name='selection',
+                                   meta=OVERLAY,
+                                   hoverinfo='skip',
+                                   marker=dict(size=2, color='gold')))
+
+    if measure is not None:
+        with span('query', query='nearest'):
+            start = time.perf_counter()
+            snap, (i, j) = tree.nearest(measure)
+            distance = float(np.linalg.norm(vertices[i] - vertices[j]))
+            info['measure'] = dict(vertices=(int(i), int(j)),
+                                   distance=distance,
+                                   snap=snap.tolist(),
+                                   query_time=time.perf_counter() - start)
+
+        traces.append(go.Scatter3d(x=x[[i, j]],
+                                   y=y[[i, j]],
+                                   z=z[[i, j]],
+                                   mode='lines+markers+text',
+                                   name='measure',
+                                   meta=OVERLAY,
+                                   text=['', f'{distance:.4g}'],
+                                   line=dict(color='black', width=4),
+                                   marker=dict(size=4, color='black')))
+
+    return traces, info
+
+
+def parse_point(text):
+    """
+    return:
+        returns the point typed as "x, y, z" (commas or spaces), or None
+    """
+    try:
+        point = tuple(float(value) for value in text.replace(',', ' ').split())
+    except ValueError:
+        return None
+
+    return point if len(point) == 3 else None
+
+
+def lod_stage(mesh_key, mesh, max_triangles):
+    """
+    level-of-detail stage: decimate the mesh to at most max_triangles
+    triangles; every level is cached per file next to the full mesh
+
+    return:
+        returns the cache key of the level, its (x, y, z, triangles, title)
+        and a dict with its triangle count, geometry payload size and build
+        time
+    """
+    key = mesh_key + ('lod', max_triangles)
+
+    def build():
+        x, y, z, triangles, title = mesh
+        start = time.perf_counter()
+        vertices, triangles = decimate(np.column_stack((x, y, z)),
+                                       triangles,
+                                       max_triangles)
+        build_time = time.perf_counter() - start
+
+        x, y, z = (np.ascontiguousarray(vertices[:, c]) for c in range(3))
+        for array in (x, y, z, triangles):
+            array.setflags(write=False)
+
+        import plotly.io as pio
+
+        I, J, K = tri_indices(triangles)
+        payload = pio.json.to_json_plotly(dict(x=x, y=y, z=z, i=I, j=J, k=K))
+        info = dict(triangles=len(triangles),
+                    vertices=len(x),
+                    payload_bytes=len(payload),
+                    build_time=build_time)
+
+        return (x, y, z, triangles, title), info
+
+    with span('lod') as stage:
+        lod_mesh, info = mesh_cache.get_or_compute(key, build)
+        stage.set(triangles=info['triangles'])
+
+    return key, lod_mesh, info
+
+
+def sample_stage(mesh_key, mesh, max_triangles):
+    """
+    preview stage: a random subset of max_triangles faces, see
+    mesh_ops.sample_faces; much cheaper than lod_stage on large meshes
+
+    return:
+        returns the cache key of the sample and its (x, y, z, triangles, title)
+    """
+    key = mesh_key + ('sample', max_triangles)
+
+    def build():
+        x, y, z, triangles, title = mesh
+        vertices, triangles = sample_faces(np.column_stack((x, y, z)), triangles, max_triangles)
+        x, y, z = (np.ascontiguousarray(vertices[:, c]) for c in range(3))
+        for array in (x, y, z, triangles):
+            array.setflags(write=False)
+
+        return x, y, z, triangles, title
+
+    with span('sample') as stage:
+        sample = mesh_cache.get_or_compute(key, build)
+        stage.set(triangles=len(sample[3]))
+
+    return key, sample
+
+
+def quantize_coordinates(vertices, bits):
+    """
+    snap the vertices to a uniform grid of 2**bits steps along the longest
+    side of the bounding box, rounded to the decimals of the grid step so
+    they also print short as json text
+
+    return:
+        returns the quantized float64 vertices
+    """
+    lo = vertices.min(axis=0)
+    step = float((vertices.max(axis=0) - lo).max()) / (2**bits - 1)
+    if step == 0:
+        return vertices
+
+    decimals = max(int(np.ceil(-np.log10(step))) + 1, 0)
+
+    return np.round(lo + np.round((vertices - lo) / step) * step, decimals)
+
+
+def compact_mesh(x, y, z, simplices, payload='binary', quantize_bits=None):
+    """
+    params:
+        payload is 'json' to keep the dtypes, or 'binary' for float32
+        coordinates and uint16 (up to 65536 vertices) or uint32 indices
+        quantize_bits optionally quantizes the coordinates, see
+        quantize_coordinates
+
+    return:
+        returns x, y, z, simplices
+
+    plotly >= 6 sends numpy arrays as base64 typed arrays ({dtype, bdata}),
+    decoded by the plotly.js of streamlit >= 1.34, so the binary dtypes are
+    what reaches the browser; both are pinned in requirements.txt.
+    """
+    vertices = np.column_stack((x, y, z)).astype(float)
+    if quantize_bits:
+        vertices = quantize_coordinates(vertices, quantize_bits)
+
+    simplices = np.asarray(simplices)
+    if payload == 'binary':
+        vertices = vertices.astype(np.float32)
+        index_dtype = np.uint16 if len(vertices) <= 2**16 else np.uint32
+        simplices = simplices.astype(index_dtype)
+
+    x, y, z = (np.ascontiguousarray(vertices[:, c]) for c in range(3))
+
+    return x, y, z, simplices
+
+
+def trace_stage(mesh_key, mesh, colormap=RdBu, color_mode='facecolor',
+                plot_edges=None, payload='json', quantize_bits=None, color_by='height',
+                clip=None):
+    """
+    pure trace stage: color the mesh and build its wireframe (both cached
+    next to it), then build the go.Mesh3d and go.Scatter3d traces.
+    The binary payload (see compact_mesh) always colors by intensity, since
+    per-face rgb strings cannot be sent as a typed array
+
+    params:
+        color_by is 'height' for the face z-means colored per color_mode,
+        or a scalar field (see field_stage), always colored by intensity
+        clip cuts the mesh by a plane, see clip_stage; the colors of the
+        whole mesh are carried over, so they do not shift while the plane
+        moves, and the cross-section is drawn as an extra line trace
+
+    return:
+        returns the list of traces
+    """
+    import plotly.graph_objs as go
+
+    if payload not in payload_modes:
+        raise ValueError(f'unknown payload {payload!r}')
+    if color_by not in color_fields:
+        raise ValueError(f'unknown color_by {color_by!r}')
+
+    if payload == 'binary':
+        color_mode = 'intensity'
+
+    # colors, clipping and fields come from the full precision mesh:
+    # compaction keeps the vertex and face order
+    x, y, z, triangles, title = mesh
+    if color_by != 'height':
+        values, location = field_stage(mesh_key, mesh, color_by)
+        with span('color', color_by=color_by):
+            colors = mesh_cache.get_or_compute(
+                mesh_key + ('colors', colormap.name, color_by),
+                lambda: field_colors(values, location, colormap, color_by.replace('_', ' ')))
+    else:
+        with span('color', color_mode=color_mode):
+            colors = mesh_cache.get_or_compute(
+                mesh_key + ('colors', colormap.name, color_mode),
+                lambda: face_colors(x, y, z, triangles, colormap, color_mode))
+
+    section = None
+    if clip is not None:
+        # a new mesh for every plane position, so nothing below is cached
+        clipped = clip_stage(mesh_key, mesh, clip)
+        colors = clip_colors(colors, clipped)
+        vertices, triangles = clipped['vertices'], clipped['triangles']
+        section = edge_lines(vertices, clipped['section'])
+        x, y, z = vertices.T
+        mesh_key = None
+        if payload == 'binary' or quantize_bits:
+            x, y, z, triangles = compact_mesh(x, y, z, triangles, payload, quantize_bits)
+        mesh = (x, y, z, triangles, title)
+
+    elif payload == 'binary' or quantize_bits:
+        mesh_key = mesh_key + ('compact', payload, quantize_bits)
+        mesh = mesh_cache.get_or_compute(
+            mesh_key,
+            lambda: compact_mesh(x, y, z, triangles, payload, quantize_bits) + (title,))
+
+    if payload == 'binary':
+        colors = dict(colors, intensity=colors['intensity'].astype(np.float32))
+
+    x, y, z, triangles, _ = mesh
+    edges = None
+    if plot_edges is not None:
+        with span('edges', plot_edges=plot_edges):
+            if mesh_key is None:
+                edges = wireframe(x, y, z, triangles, plot_edges)
+            else:
+                edges = mesh_cache.get_or_compute(
+                    mesh_key + ('edges', plot_edges),
+                    lambda: wireframe(x, y, z, triangles, plot_edges))
+
+    with span('trace'):
+        traces = plotly_trisurf(x,
+                                y,
+                                z,
+                                triangles,
+                                colormap=colormap,
+                                plot_edges=plot_edges,
+                                colors=colors,
+                                edges=edges)
+
+    if section is not None:
+        Xs, Ys, Zs = section
+        traces.append(go.Scatter3d(x=Xs,
+                                   y=Ys,
+                                   z=Zs,
+                                   mode='lines',
+                                   name='section',
+                                   hoverinfo='skip',
+                                   line=dict(color='rgb(200,0,0)',
+                                             width=5)))
+
+    return traces
+
+
+def clip_stage(mesh_key, mesh, clip):
+    """
+    clipping stage: cut the mesh by a plane and keep the half behind it.
+    The plane sweep of every normal (signed vertex distances, sorted face
+    ranges, see mesh_ops.PlaneSweep) is cached next to the mesh, so moving
+    the plane only builds the faces it cuts
+
+    params:
+        clip is (normal, fraction): the plane normal and the position of
+        the plane as a fraction (0 to 1) of the extent of the mesh along it
+
+    return:
+        returns the clipped mesh, see PlaneSweep.clip
+    """
+    normal, fraction = clip
+    x, y, z, triangles, _ = mesh
+    with span('clip') as stage:
+        sweep = mesh_cache.get_or_compute(
+            mesh_key + ('sweep', tuple(float(c) for c in normal)),
+            lambda: PlaneSweep(np.column_stack((x, y, z)), triangles, normal))
+        clipped = sweep.clip(sweep.offset(fraction))
+        stage.set(triangles=len(clipped['triangles']), cut=len(clipped['section']))
+
+    return clipped
+
+
+def clip_colors(colors, clipped):
+    """
+    return:
+        returns the go.Mesh3d color arguments of a mesh carried over to its
+        clipped mesh, see mesh_ops.clip_values
+    """
+    if 'facecolor' in colors:
+        return dict(colors, facecolor=clip_values(colors['facecolor'], 'cell', clipped))
+
+    return dict(colors, intensity=clip_values(colors['intensity'], colors['intensitymode'], clipped))
+
+
+def figure_payload(fig):
+    """
+    return:
+        returns the size in bytes of the figure serialized as json, and the
+        time the serialization took
+    """
+    import plotly.io as pio
+
+    start = time.perf_counter()
+    payload = pio.to_json(fig, validate=False)
+
+    return len(payload), time.perf_counter() - start
+
+
+def scene_style(axis=True):
+    """
+    return:
+        returns the 3d scene settings, with or without axis
+    """
+    if axis:
+        # with axis
+        axis = dict(
+            showbackground=True,
+            backgroundcolor="rgb(230, 230,230)",
+            gridcolor="rgb(255, 255, 255)",
+            zerolinecolor="rgb(255, 255, 255)",
+        )
+
+        scene=dict(
+            xaxis=dict(axis),
+            yaxis=dict(axis),
+            zaxis=dict(axis),
+            # aspectratio=dict( x=1, y=2, z=0.5),
+            # camera=dict(eye=dict(x=1.25, y=1.25, z= 1.25))
+         )
+
+    else:
+        # with no axis
+        noaxis=dict(
+            showbackground=False,
+            showline=False,
+            zeroline=False,
+            showgrid=False,
+            showticklabels=False,
+            title=''
+        )
+
+        scene=dict(
+            xaxis=dict(noaxis),
+            yaxis=dict(noaxis),
+            zaxis=dict(noaxis),
+
+             )
+
+    return scene
+
+
+def layout_stage(title, axis=True, paper_bgcolor='snow', width=900, height=500):
+    """
+    cheap layout stage: everything about the figure that does not depend on
+    the mesh
+
+    return:
+        returns the go.Layout
+    """
+    import plotly.graph_objs as go
+
+    scene = scene_style(axis)
+
+    return go.Layout(
+        title= dict(
+            text=title,
+            x=0.5,
+            y=0.95,
+            font=dict(
+                family="Rockwell",
+                size=20,
+                color='#000000'
+                )
+            ),
+        hoverlabel=dict(
+            bgcolor="rgba(58, 71, 80, 0.1)",
+            font_size=16,
+            font_family="Rockwell"
+            ),
+        margin=dict(
+            l=0,
+            b=0,
+            r=0,
+            t=0,
+        ),
+        width=width,
+        height=height,
+
+        paper_bgcolor=paper_bgcolor,
+        scene=scene,
+        scene_aspectmode="data"
+
+)
+
+
+def surface_figure(file_name,
+                   data_type,
+                   axis=True,
+                   paper_bgcolor='snow',
+                   width=900,
+                   height=500,
+                   color_mode='facecolor',
+                   max_triangles=None,
+                   plot_edges=None,
+                   payload='json',
+                   quantize_bits=None,
+                   clean=False,
+                   color_by='height',
+                   selection=None,
+                   measure=None,
+                   clip=None,
+                   source=None,
+                   previous=None
+                   ):
+    """
+    build the figure of a sample model without any streamlit output
+
+    params:
+        max_triangles is the triangle budget; larger meshes are decimated
+        plot_edges adds a wireframe overlay, see wireframe
+        payload and quantize_bits select the array encoding, see compact_mesh
+        clean runs the cleanup stage before the level of detail
+        color_by selects the colored scalar field, see trace_stage
+        selection and measure add the overlays of query_stage
+        clip cuts the mesh by a plane, see clip_stage
+        source is a (mesh_key, mesh) pair, e.g. from upload_stage, drawn
+        instead of the sample model file_name
+        previous is the (trace_key, figure, stats) tuple returned by an
+        earlier call; when its traces are still valid only the layout and
+        the overlays of that figure are replaced, skipping the mesh and
+        trace stages
+
+    return:
+        returns (trace_key, figure, stats); stats holds the info dict of
+        the optional stages that ran ('clean', 'lod', 'query')
+    """
+    import plotly.graph_objs as go
+
+    mesh_key, mesh = source if source is not None else mesh_stage(file_name, data_type)
+    stats = {}
+    if clean:
+        mesh_key, mesh, stats['clean'] = clean_stage(mesh_key, mesh)
+    if max_triangles is not None:
+        mesh_key, mesh, stats['lod'] = lod_stage(mesh_key, mesh, max_triangles)
+
+    trace_key = mesh_key + (RdBu.name, color_mode, color_by, plot_edges, payload, quantize_bits, clip)
+    with span('layout'):
+        layout = layout_stage(mesh[4], axis, paper_bgcolor, width, height)
+        if clip is not None:
+            # the axes of the whole mesh, so the view holds still while
+            # the plane moves
+            for name, values in zip(('xaxis', 'yaxis', 'zaxis'), mesh[:3]):
+                layout.scene[name].range = [float(values.min()), float(values.max())]
+
+    if previous is not None and previous[0] == trace_key:
+        with span('figure', reused=True):
+            fig = previous[1]
+            fig.layout = layout
+    else:
+        traces = trace_stage(mesh_key, mesh, RdBu, color_mode,
+                             plot_edges, payload, quantize_bits, color_by, clip)
+        with span('figure', reused=False):
+            fig = go.Figure(data=traces, layout=layout)
+
+    if selection is not None or measure is not None:
+        overlay, stats['query'] = query_stage(mesh_key, mesh, selection, measure)
+    else:
+        overlay = []
+
+    # swap the overlays only, the mesh traces stay as they are
+    if overlay or any(trace.meta == OVERLAY for trace in fig.data):
+        fig.data = [trace for trace in fig.data if trace.meta != OVERLAY]
+        fig.add_traces(overlay)
+
+    return trace_key, fig, stats
+
+
+def warm_model(file_name,
+               data_type,
+               color_mode='facecolor',
+               max_triangles=None,
+               clean=False,
+               color_by='height',
+               source=None,
+               cancelled=lambda: False
+               ):
+    """
+    run the cached stages of a model (mesh, cleanup, level of detail and
+    face colors) without building a figure, so a later surface_figure call
+    with the same options only pays for the trace and layout
+
+    params:
+        source is a (mesh_key, mesh) pair, see surface_figure
+        cancelled is polled between stages; the warm-up stops once it
+        returns True
+
+    return:
+        returns True when every stage ran
+    """
+    mesh_key, mesh = source if source is not None else mesh_stage(file_name, data_type)
+    if clean and not cancelled():
+        mesh_key, mesh, _ = clean_stage(mesh_key, mesh)
+    if max_triangles is not None and not cancelled():
+        mesh_key, mesh, _ = lod_stage(mesh_key, mesh, max_triangles)
+    if cancelled():
+        return False
+
+    if color_by != 'height':
+        field_stage(mesh_key, mesh, color_by)
+        return True
+
+    x, y, z, triangles, _ = mesh
+    mesh_cache.get_or_compute(
+        mesh_key + ('colors', RdBu.name, color_mode),
+        lambda: face_colors(x, y, z, triangles, RdBu, color_mode))
+
+    return True
+
+
+def export_stage(file_name, data_type, file_format, max_triangles=None, clean=False, source=None):
+    """
+    export stage: serialize the mesh as drawn (after the cleanup and level
+    of detail stages) to a download format; cached next to the level
+
+    params:
+        file_format is a key of mesh_io.EXPORT_FORMATS
+        source is a (mesh_key, mesh) pair, see surface_figure
+
+    return:
+        returns the file content as bytes
+    """
+    mesh_key, mesh = source if source is not None else mesh_stage(file_name, data_type)
+    if clean:
+        mesh_key, mesh, _ = clean_stage(mesh_key, mesh)
+    if max_triangles is not None:
+        mesh_key, mesh, _ = lod_stage(mesh_key, mesh, max_triangles)
+
+    x, y, z, triangles, _ = mesh
+    with span('export', format=file_format) as stage:
+        data = mesh_cache.get_or_compute(
+            mesh_key + ('export', file_format),
+            lambda: export_mesh(np.column_stack((x, y, z)), triangles, file_format))
+        stage.set(nbytes=len(data))
+
+    return data
+
+
+def _model_traces(file_name, data_type, color_mode, max_triangles):
+    """
+    mesh, level-of-detail and trace stages of one comparison cell; runs on
+    the comparison pool
+
+    return:
+        returns the title, the traces and the seconds it took
+    """
+    start = time.perf_counter()
+    mesh_key, mesh = mesh_stage(file_name, data_type)
+    if max_triangles is not None:
+        mesh_key, mesh, _ = lod_stage(mesh_key, mesh, max_triangles)
+    traces = trace_stage(mesh_key, mesh, RdBu, color_mode)
+
+    return mesh[4], traces, time.perf_counter() - start
+
+
+_comparison_pool = None
+
+def comparison_figure(models,
+                      cols=2,
+                      axis=True,
+                      paper_bgcolor='snow',
+                      width=900,
+                      height=500,
+                      color_mode='facecolor',
+                      max_triangles=None
+                      ):
+    """
+    build a grid of 3d scenes, one per model; the models are loaded and
+    their traces built concurrently on a shared thread pool, so a cold
+    comparison costs about the slowest model rather than the sum
+
+    params:
+        models is a list of (file_name, data_type) pairs
+        cols is the number of scenes per row; height is per row
+
+    return:
+        returns the figure and a dict with the wall time and the seconds
+        of every model
+    """
+    from plotly.subplots import make_subplots
+
+    global _comparison_pool
+    if _comparison_pool is None:
+        _comparison_pool = ThreadPoolExecutor(max_workers=min(8, (os.cpu_count() or 1) + 4),
+                                              thread_name_prefix="comparison")
+
+    start = time.perf_counter()
+    futures = [_comparison_pool.submit(_model_traces, file_name, data_type,
+                                       color_mode, max_triangles)
+               for file_name, data_type in models]
+    results = [future.result() for future in futures]
+
+    cols = max(1, min(cols, len(models)))
+    rows = -(-len(models) // cols)
+    fig = make_subplots(rows=rows,
+                        cols=cols,
+                        specs=[[dict(type='scene')] * cols for _ in range(rows)],
+                        subplot_titles=[title for title, _, _ in results],
+                        horizontal_spacing=0.01,
+                        vertical_spacing=0.05)
+
+    for n, (_, traces, _) in enumerate(results):
+        for trace in traces:
+            fig.add_trace(trace, row=n // cols + 1, col=n % cols + 1)
+
+    # the same camera and style in every scene, so the views line up
+    scene = dict(scene_style(axis),
+                 aspectmode="data",
+                 camera=dict(eye=dict(x=1.25, y=1.25, z=1.25)))
+    fig.update_scenes(scene)
+    fig.update_layout(width=width,
+                      height=height * rows,
+                      margin=dict(l=0, b=0, r=0, t=30),
+                      paper_bgcolor=paper_bgcolor,
+                      showlegend=False)
+
+    timings = dict(wall_time=time.perf_counter() - start,
+                   model_times=[seconds for _, _, seconds in results])
+
+    return fig, timings
+
+
+def write_html(fig, html_path):
+    """
+    write the figure as html next to a shared plotly.min.js instead of
+    embedding the whole bundle in every file
+
+    return:
+        returns the number of bytes written
+    """
+    html_path = Path(html_path)
+    html_path.parent.mkdir(parents=True, exist_ok=True)
+    write_plotlyjs(html_path.parent)
+    fig.write_html(html_path, include_plotlyjs='directory')
+
+    return html_path.stat().st_size
+
+
+def write_plotlyjs(out_dir):
+    """
+    write the plotly.min.js bundle referenced by include_plotlyjs='directory'
+    once per output directory
+    """
+    bundle_path = Path(out_dir) / "plotly.min.js"
+    if not bundle_path.exists():
+        tmp_path = bundle_path.with_name(f"plotly.min.js.{os.getpid()}.{threading.get_ident()}.tmp")
+        from plotly.offline import get_plotlyjs
+
+        tmp_path.write_text(get_plotlyjs(), encoding="utf-8")
+        os.replace(tmp_path, bundle_path)
+
+
+def progressive_levels(n_triangles, max_triangles=None):
+    """
+    return:
+        returns the triangle budgets shown one after the other, coarse to
+        fine: the PROGRESSIVE_LEVELS below the target, then max_triangles
+        itself (None for the full mesh)
+    """
+    target = n_triangles if max_triangles is None else min(n_triangles, max_triangles)
+
+    return [level for level in PROGRESSIVE_LEVELS if level < target] + [max_triangles]
+
+
+def progressive_stage(chart, refiner, file_name, data_type, max_triangles=None, **options):
+    """
+    show the coarser levels of detail of a model in chart (a st.empty)
+    before the full one: the coarsest, a face sample (see sample_stage), is
+    built right away, the finer ones are decimated by refiner in the
+    background and shown as they complete
+
+    params:
+        refiner is a prefetch.Refiner; a new request cancels the stale
+        refinements of the previous one
+        options are the surface_figure options
+
+    return:
+        returns a dict with the levels and the seconds to the first chart
+        (time to first pixel, server side), or None when the model is small,
+        its levels were already shown or a newer request took over
+    """
+    from concurrent.futures import CancelledError
+
+    start = time.perf_counter()
+    source = options.get('source')
+    mesh_key, mesh = source if source is not None else mesh_stage(file_name, data_type)
+    levels = progressive_levels(len(mesh[3]), max_triangles)
+    request = (mesh_key, options.get('clean'), options.get('color_mode'), options.get('color_by'),
+               max_triangles)
+    if len(levels) < 2 or refiner.done == request:
+        # nothing to refine, but the refinements of another model are stale
+        if request != refiner.request:
+            refiner.cancel()
+            refiner.request = request
+        return None
+
+    futures = refiner.refine(file_name, data_type, levels[1:], request,
+                             clean=options.get('clean', False),
+                             color_mode=options.get('color_mode', 'facecolor'),
+                             color_by=options.get('color_by', 'height'),
+                             source=source)
+    info = dict(levels=levels)
+    with span('progressive', levels=len(levels)) as stage:
+        try:
+            for level, ready in zip(levels[:-1], [None] + futures[:-1]):
+                if ready is None:
+                    sample = sample_stage(mesh_key, mesh, level)
+                    _, fig, _ = surface_figure(file_name, data_type, **dict(options, source=sample))
+                elif ready.result():
+                    _, fig, _ = surface_figure(file_name, data_type, max_triangles=level, **options)
+                else:
+                    return None
+                chart.plotly_chart(fig, use_container_width=True)
+                info.setdefault('first_pixel', time.perf_counter() - start)
+            # the full level is built by the caller once its stages are warm
+            if not futures[-1].result():
+                return None
+        except CancelledError:  # a newer request took over
+            return None
+        stage.set(first_pixel=info['first_pixel'])
+
+    return info
+
+
+def surface_captions(stats, progressive_info=None):
+    """
+    write the captions of the optional stages of a surface_figure call
+    """
+    import streamlit as st
+
+    if progressive_info is not None:
+        st.caption(f"Progressive: first view of {progressive_info['levels'][0]:,} triangles "
+                   f"in {progressive_info['first_pixel'] * 1000:.0f} ms, "
+                   f"refined through {len(progressive_info['levels'])} levels "
+                   f"in {progressive_info['refined'] * 1000:.0f} ms")
+
+    if 'clean' in stats:
+        clean_info = stats['clean']
+        st.caption(f"Cleanup: removed {clean_info['removed_vertices']:,} vertices "
+                   f"and {clean_info['removed_faces']:,} faces "
+                   f"in {clean_info['clean_time'] * 1000:.0f} ms")
+
+    if 'lod' in stats:
+        lod_info = stats['lod']
+        st.caption(f"LOD: {lod_info['triangles']:,} triangles, "
+                   f"{lod_info['vertices']:,} vertices, "
+                   f"{lod_info['payload_bytes'] / 2**10:,.0f} KB geometry payload, "
+                   f"built in {lod_info['build_time'] * 1000:.0f} ms")
+
+    query_info = stats.get('query', {})
+    if 'selection' in query_info:
+        selection_info = query_info['selection']
+        st.caption(f"Selection: {selection_info['vertices']:,} vertices, "
+                   f"{selection_info['faces']:,} faces, "
+                   f"area {selection_info['area']:.4g}, "
+                   f"queried in {selection_info['query_time'] * 1000:.1f} ms")
+
+    if 'measure' in query_info:
+        measure_info = query_info['measure']
+        st.caption(f"Distance between vertices {measure_info['vertices'][0]:,} and "
+                   f"{measure_info['vertices'][1]:,}: {measure_info['distance']:.4g} "
+                   f"(points snapped by {measure_info['snap'][0]:.3g} and "
+                   f"{measure_info['snap'][1]:.3g}, "
+                   f"queried in {measure_info['query_time'] * 1000:.1f} ms)")
 
 
 def plotly_Surface_Triangulation(file_name,
@@ -107,131 +1475,120 @@ def plotly_Surface_Triangulation(file_name,
                                  paper_bgcolor='snow',
                                  width=900,
                                  height=500,
-                                 save_html=None
+                                 save_html=None,
+                                 color_mode='facecolor',
+                                 max_triangles=None,
+                                 plot_edges=None,
+                                 payload='json',
+                                 quantize_bits=None,
+                                 clean=False,
+                                 color_by='height',
+                                 selection=None,
+                                 measure=None,
+                                 clip=None,
+                                 source=None,
+                                 progressive=None
                                  ):
+    """
+    draw a model with st.plotly_chart, see surface_figure for the options
 
+    params:
+        progressive is a prefetch.Refiner; when given, coarse levels of
+        detail are shown first, see progressive_stage
+    """
+    import streamlit as st
 
-    if data_type not in (".json", ".ply"):
+    if source is None and data_type not in (".json", ".ply"):
         print(f"{file_name} - doesn't support")
 
     else:
 
-        if data_type == ".json":
-
-            with open(f"data/car_models_json/{file_name}.json") as json_file:
-                # load json file
-                data = json.load(json_file)
-                # Extract vertices & triangles
-                vertices, triangles = np.array(data['vertices']), np.array(data['faces']) - 1
-                # Unpack vertices
-                x, y, z = vertices[:,0], vertices[:,2], -vertices[:,1]
-                # Get Car type from json
-                car_type = data['car_type']
-
-                file_name = file_name +  " - " + car_type
-
-        elif data_type == ".ply":
-            # req = urllib2.Request('https://people.sc.fsu.edu/~jburkardt/data/ply/skull.ply')
-            # opener = urllib2.build_opener()
-            # f = opener.open(req)
-            plydata = PlyData.read(f"data/ply_data/{file_name}.ply")
-
-            nr_points = plydata.elements[0].count
-            nr_faces = plydata.elements[1].count
-            points = np.array([plydata['vertex'][k] for k in range(nr_points)])
-
-            if len(points[0]) > 3:
-                points = list(map(itemgetter(0, 1, 2), points))
-
-            x,y,z = zip(*points)
-            triangles = [plydata['face'][k][0] for k in range(nr_faces)]
-
-
-        # get Graph data
-        graph_data = plotly_trisurf(x,
-                                    y,
-                                    z,
-                                    triangles,
-                                    colormap=cm.RdBu,
-                                    plot_edges=None)
-
-        if axis:
-            # with axis
-            axis = dict(
-                showbackground=True,
-                backgroundcolor="rgb(230, 230,230)",
-                gridcolor="rgb(255, 255, 255)",
-                zerolinecolor="rgb(255, 255, 255)",
-            )
-
-            scene=dict(
-                xaxis=dict(axis),
-                yaxis=dict(axis),
-                zaxis=dict(axis),
-                # aspectratio=dict( x=1, y=2, z=0.5),
-                # camera=dict(eye=dict(x=1.25, y=1.25, z= 1.25))
-             )
-
-        else:
-            # with no axis
-            noaxis=dict(
-                showbackground=False,
-                showline=False,
-                zeroline=False,
-                showgrid=False,
-                showticklabels=False,
-                title=''
-            )
-
-            scene=dict(
-                xaxis=dict(noaxis),
-                yaxis=dict(noaxis),
-                zaxis=dict(noaxis),
-
-                 )
-
-        layout = go.Layout(
-            title= dict(
-                text=file_name,
-                x=0.5,
-                y=0.95,
-                font=dict(
-                    family="Rockwell",
-                    size=20,
-                    color='#000000'
-                    )
-                ),
-            hoverlabel=dict(
-                bgcolor="rgba(58, 71, 80, 0.1)",
-                font_size=16,
-                font_family="Rockwell"
-                ),
-            margin=dict(
-                l=0,
-                b=0,
-                r=0,
-                t=0,
-            ),
-            width=width,
-            height=height,
-
-            paper_bgcolor=paper_bgcolor,
-            scene=scene,
-            scene_aspectmode="data"
+        options = dict(axis=axis,
+                       paper_bgcolor=paper_bgcolor,
+                       width=width,
+                       height=height,
+                       color_mode=color_mode,
+                       plot_edges=plot_edges,
+                       payload=payload,
+                       quantize_bits=quantize_bits,
+                       clean=clean,
+                       color_by=color_by,
+                       selection=selection,
+                       measure=measure,
+                       clip=clip,
+                       source=source)
 
-    )
+        # the captions go above the chart, but are only known once the
+        # last level of detail is built
+        captions, chart = st.container(), st.empty()
+        start = time.perf_counter()
+        progressive_info = None
+        if progressive is not None:
+            progressive_info = progressive_stage(chart, progressive, file_name, data_type,
+                                                 max_triangles, **options)
 
+        # the figure of the last rerun is kept per session, so a layout-only
+        # change (sliders, background) reuses its Mesh3d trace
+        st.session_state['surface_figure'] = surface_figure(
+            file_name,
+            data_type,
+            max_triangles=max_triangles,
+            previous=st.session_state.get('surface_figure'),
+            **options)
+        _, fig, stats = st.session_state['surface_figure']
 
-        fig = go.Figure(data=graph_data,
-                        layout=layout)
         if save_html:
-            fig.write_html(f"Output/{plotly_Surface_Triangulation}.html")
+            write_html(fig, f"Output/{file_name}.html")
             
+        if active():
+            # costs a second serialization, so only measured while tracing
+            with span('serialize') as stage:
+                stage.set(payload_bytes=figure_payload(fig)[0])
+
         # fig.show()
-        st.plotly_chart(fig, use_container_width=True)
+        with span('chart'):
+            chart.plotly_chart(fig, use_container_width=True)
+
+        if progressive_info is not None:
+            progressive_info['refined'] = time.perf_counter() - start
+            # layout-only reruns of the same model skip the coarse levels
+            progressive.finish()
+
+        with captions:
+            surface_captions(stats, progressive_info)
         
 
 
+# meta of the selection and measurement traces, see query_stage
+OVERLAY = 'overlay'
+
+# region shapes offered by the selection tool, see selection_region
+selection_shapes = [None, 'box', 'sphere']
+
+# clipping plane normals offered by the clip tool, see clip_stage
+clip_planes = {'x': (1, 0, 0), 'y': (0, 1, 0), 'z': (0, 0, 1)}
+
+# wireframe overlays offered by the edge selector, see wireframe
+edge_modes = [None, 'all', 'feature', 'boundary']
+
+# array encodings of the figure sent to the browser, see compact_mesh
+payload_modes = ['json', 'binary']
+
+# coordinate quantization offered by the payload settings
+quantize_levels = [None, 16, 12, 10]
+
+# colorings offered by the "color by" selector: the face heights or a
+# scalar field, see trace_stage
+color_fields = ['height'] + list(SCALAR_FIELDS)
+
+# triangle budgets offered by the level-of-detail selector
+triangle_budgets = [None, 50000, 20000, 10000, 5000, 2000]
+
+# triangle budgets shown before the full level by progressive rendering,
+# see progressive_stage
+PROGRESSIVE_LEVELS = [2000, 50000]
+
+
 paper_bgcolr = ['aliceblue',
                 'antiquewhite',
                 'aqua',